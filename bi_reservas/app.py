@@ -2,8 +2,28 @@ import pandas as pd
 import streamlit as st
 import plotly.express as px
 
+from cache_lru import CacheLRU
+from dados import (
+    METAS, RESERVAS, avisos_parse, dimensao_unidades,
+    divergencias_unidades, legenda_atualizacao, load_data_versionado
+)
+from figuras import cache_figuras, figura
+from indices import (
+    cubo_reservas, hierarquia_filtros, indice_metas, painel_predios,
+    painel_unidades
+)
+from medicao import etapa, iniciar_execucao, painel_tempos
+from niveis import classificar_niveis
+from ranking import (
+    OPCOES_TOP_N, TAMANHO_PAGINA, pagina, pagina_ranking, top_n_com_outros,
+    total_paginas
+)
+
 st.set_page_config(page_title="BI Reservas", layout="wide")
 
+# tempos por etapa deste rerun (painel no fim da página com ?debug=1)
+iniciar_execucao()
+
 CORES_CANAIS = {
     "Airbnb": "#FF00CC",
     "Booking.com": "#0217FF",
@@ -14,80 +34,27 @@ CORES_CANAIS = {
 }
 
 # ======================
-# 1. INPUT DOS DADOS
-# ======================
-
-
-@st.cache_data(ttl=3600)
-def load_data():
-    import gspread
-    from google.oauth2.service_account import Credentials
-
-    scopes = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
-
-    creds = Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"],
-        scopes=scopes
-    )
-
-    gc = gspread.authorize(creds)
-
-    sh = gc.open_by_key(st.secrets["google_sheets"]["spreadsheet_id"])
-
-    # 📌 Tabela principal de reservas
-    ws_res = sh.worksheet(st.secrets["google_sheets"]["sheet_name"])
-    df_reservas = pd.DataFrame(ws_res.get_all_records())
-    df_reservas = df_reservas.rename(
-        columns=lambda x: x.strip())  # limpa espaços
-
-    # 📌 Tabela de metas / níveis (Base Níveis)
-    ws_meta = sh.worksheet("Base Níveis")
-    df_meta = pd.DataFrame(ws_meta.get_all_records())
-    df_meta = df_meta.rename(
-        columns=lambda x: x.strip().lower())  # normaliza nomes
-
-    return df_reservas, df_meta
-
-
-df, df_meta = load_data()
-
-df["mes_dt"] = pd.to_datetime(df["mes"] + "-01")
-
-# ======================
-# 1. NORMALIZA TIPOS (BRL + QUANTIDADE)
+# 1. INPUT DOS DADOS (já normalizados em dados.py)
 # ======================
 
-
-def parse_brl(series):
-    return (
-        series
-        .astype(str)
-        .str.strip()
-        .str.replace("\u00a0", "", regex=False)      # espaço invisível
-        .str.replace(".", "", regex=False)           # remove milhar
-        .str.replace(",", ".", regex=False)          # decimal BR → US
-        .str.replace(r"[^\d.-]", "", regex=True)     # remove R$, texto
-        .replace("", "0")
-        .astype(float)
-    )
+# dispara reservas e metas juntas; cubo e índices leem desta carga.
+# versao_dados entra na chave das figuras em cache (figuras.py)
+with etapa("load"):
+    _, versao_dados = load_data_versionado(RESERVAS, METAS)
 
 
 def calcular_kpis(df, mes):
     periodo = pd.Period(mes, freq="M")
     dias_mes = periodo.days_in_month
 
-    reservas = df["id_reserva"].nunique()
+    reservas = df["reservas"].sum()
     noites = df["noites_mes"].sum()
 
     receita_total = df["valor_mes"].sum()
     receita_limpeza = df["limpeza_mes"].sum()
     receita_diarias = receita_total - receita_limpeza
 
-    unidades = (
-        df[["id_propriedade", "unidade"]]
-        .drop_duplicates()
-        .shape[0]
-    )
+    unidades = df["id_unidade"].nunique()
 
     ocupacao = (
         (noites / (unidades * dias_mes)) * 100
@@ -103,31 +70,146 @@ def calcular_kpis(df, mes):
     )
 
 
-# colunas monetárias (BRL)
-cols_money = ["valor_mes", "limpeza_mes"]
+def montar_recorte(cubo, partner, mes, propriedade, unidade, canais):
+    """
+    Fatia do cubo para a seleção da sidebar e tudo o que as seções
+    derivam dela (KPIs, tabelas, share e rankings). Guardado no
+    cache_recortes(): trate o resultado como somente leitura.
+    """
+    with etapa("filtro"):
+        df_f = cubo.mes(pd.Period(mes, freq="M"))
+
+        if partner != "Todos":
+            df_f = df_f[df_f["partner"] == partner]
 
-for col in cols_money:
-    df[col] = parse_brl(df[col])
+        if propriedade != "Todos":
+            df_f = df_f[df_f["propriedade"] == propriedade]
 
-# noites = quantidade (NÃO moeda)
-df["noites_mes"] = df["noites_mes"].astype(
-    str).str.replace(",", ".").astype(float).astype(int)
+        if unidade != "Todas":
+            df_f = df_f[df_f["unidade"] == unidade]
 
+        if canais:
+            df_f = df_f[df_f["canal"].isin(canais)]
 
-# IDs (inteiros simples, sem nullable)
-df["id_reserva"] = (
-    df["id_reserva"]
-    .astype(str)
-    .str.replace(r"\D", "", regex=True)
-    .astype(int)
-)
+    if df_f.empty:
+        return {"df_f": df_f}
+
+    # agrupamentos sobre as chaves inteiras; nomes vêm da dimensão
+    unidades = dimensao_unidades()
+
+    receita_unidade = (
+        df_f.groupby("id_unidade")
+        .agg(receita=("valor_mes", "sum"))
+        .reset_index()
+    )
+    receita_unidade.insert(
+        0, "unidade", unidades.nomes(receita_unidade["id_unidade"])["unidade"]
+    )
+    receita_unidade = receita_unidade.drop(columns=["id_unidade"])
+
+    # --- calendário real do mês ---
+    periodo = pd.Period(mes, freq="M")
+    dias_no_mes = periodo.days_in_month
+
+    # agregação principal (SEM ordenação por ranking)
+    agg = (
+        df_f.groupby(["id_propriedade", "id_unidade"])
+        .agg(
+            reservas=("reservas", "sum"),
+            noites_ocupadas=("noites_mes", "sum"),
+            receita_total=("valor_mes", "sum"),
+            receita_limpeza=("limpeza_mes", "sum")
+        )
+        .reset_index()
+    )
+
+    agg = pd.concat(
+        [
+            agg[["id_propriedade"]],
+            unidades.nomes(agg["id_unidade"]),
+            agg.drop(columns=["id_propriedade", "id_unidade"])
+        ],
+        axis=1
+    )
+
+    # métricas calculadas
+    agg["receita_diarias"] = agg["receita_total"] - agg["receita_limpeza"]
+    agg["ocupacao"] = (agg["noites_ocupadas"] / dias_no_mes) * 100
+    agg["ADR"] = (
+        agg["receita_diarias"] /
+        agg["noites_ocupadas"].replace(0, pd.NA)
+    )
+    agg["RevPAR"] = agg["ADR"] * (agg["ocupacao"] / 100)
+
+    # remove coluna técnica
+    agg = agg.drop(columns=["noites_ocupadas"])
+
+    # ordenação PADRÃO por ID (não ranking)
+    agg = agg.sort_values(["id_propriedade", "unidade"])
+
+    canal_share = (
+        df_f.groupby("canal", as_index=False, observed=True)["valor_mes"]
+        .sum()
+    )
+
+    canal_share["share"] = (
+        canal_share["valor_mes"] / canal_share["valor_mes"].sum()
+    )
+
+    # ordem/rank saem por página, no fragmento (ranking.pagina_ranking)
+    ranking_unidade = agg[[
+        "id_propriedade",
+        "propriedade",
+        "unidade",
+        "receita_total",
+        "receita_diarias",
+        "receita_limpeza",
+        "ocupacao",
+        "ADR",
+        "RevPAR"
+    ]]
+
+    ranking_predio = (
+        agg.groupby(
+            ["id_propriedade", "propriedade"], as_index=False, observed=True
+        )
+        .agg(
+            receita_total=("receita_total", "sum"),
+            receita_diarias=("receita_diarias", "sum"),
+            receita_limpeza=("receita_limpeza", "sum"),
+            ocupacao_media=("ocupacao", "mean"),
+            ADR_medio=("ADR", "mean"),
+            RevPAR_medio=("RevPAR", "mean")
+        )
+    )
+
+    ranking_predio = ranking_predio.sort_values(
+        "receita_total", ascending=False)
+    ranking_predio.insert(0, "rank", range(1, len(ranking_predio) + 1))
+
+    with etapa("KPIs do mês"):
+        kpis = calcular_kpis(df_f, mes)
+
+    return {
+        "df_f": df_f,
+        "kpis": kpis,
+        "receita_unidade": receita_unidade,
+        "agg": agg,
+        "canal_share": canal_share,
+        "ranking_unidade": ranking_unidade,
+        "ranking_predio": ranking_predio,
+    }
+
+
+@st.cache_resource
+def cache_recortes():
+    # compartilhado entre sessões; ~64 MB de recortes por processo
+    return CacheLRU(limite_bytes=64 * 1024 * 1024)
+
+
+def caches_do_painel():
+    return {"recortes": cache_recortes(), "figuras": cache_figuras()}
 
-df["id_propriedade"] = (
-    df["id_propriedade"]
-    .astype(str)
-    .str.replace(r"\D", "", regex=True)
-    .astype(int)
-)
 
 # ======================
 # 2. COLUNAS ESPERADAS
@@ -149,29 +231,28 @@ df["id_propriedade"] = (
 
 with st.sidebar:
     st.header("🔎 Filtros")
+    st.caption(legenda_atualizacao(RESERVAS, METAS))
+
+    for coluna, (qtd, exemplos) in avisos_parse().items():
+        st.caption(
+            f"⚠️ {qtd} célula(s) não numérica(s) em {coluna}: {exemplos}"
+        )
+
+    for divergencia in divergencias_unidades():
+        st.caption(f"⚠️ Grafias divergentes: {divergencia}")
+
+    # opções já prontas na hierarquia (sem varrer a base a cada rerun)
+    with etapa("hierarquia de filtros"):
+        hierarquia = hierarquia_filtros()
 
     partner = st.selectbox(
         "Partner",
-        ["Todos"] + sorted(df["partner"].unique())
+        ["Todos"] + hierarquia.partners
     )
 
-    meses = (
-        df[["mes", "mes_dt"]]
-        .drop_duplicates()
-        .sort_values("mes_dt")["mes"]
-        .tolist()
-    )
-    mes = st.selectbox("Mês", meses)
-
-    if partner != "Todos":
-        propriedades = (
-            df[df["partner"] == partner]["propriedade"]
-            .drop_duplicates()
-            .sort_values()
-            .tolist()
-        )
-    else:
-        propriedades = sorted(df["propriedade"].unique())
+    mes = st.selectbox("Mês", hierarquia.meses)
+
+    propriedades = hierarquia.predios_do_partner(partner)
 
     propriedade = st.selectbox(
         "Prédio",
@@ -179,12 +260,7 @@ with st.sidebar:
     )
 
     if propriedade != "Todos":
-        unidades = (
-            df[df["propriedade"] == propriedade]["unidade"]
-            .drop_duplicates()
-            .sort_values()
-            .tolist()
-        )
+        unidades = hierarquia.unidades_do_predio(propriedade)
         unidade = st.selectbox(
             "Unidade",
             ["Todas"] + unidades
@@ -199,8 +275,8 @@ with st.sidebar:
 
     canal = st.multiselect(
         "Canal",
-        sorted(df["canal"].unique()),
-        default=sorted(df["canal"].unique())
+        hierarquia.canais,
+        default=hierarquia.canais
     )
 
 
@@ -208,8 +284,6 @@ with st.sidebar:
 # 4. APLICA FILTROS
 # ======================
 
-df_f = df.copy()
-
 st.markdown(
     """
     <style>
@@ -312,22 +386,25 @@ with f4:
     )
 
 
-if partner != "Todos":
-    df_f = df_f[df_f["partner"] == partner]
-
-df_f = df_f[df_f["mes"] == mes]
-
-if propriedade != "Todos":
-    df_f = df_f[df_f["propriedade"] == propriedade]
+# parte do cubo (mês × partner × prédio × unidade × canal), lendo só a
+# fatia do mês; as seções abaixo agregam células, não reservas
+with etapa("cubo"):
+    cubo, versao_cubo = cubo_reservas(com_versao=True)
 
-if unidade != "Todas":
-    df_f = df_f[df_f["unidade"] == unidade]
+filtros = (partner, mes, propriedade, unidade, tuple(sorted(canal)))
+chave_recorte = (versao_cubo,) + filtros
+with etapa("recorte"):
+    recorte = cache_recortes().obter(
+        chave_recorte,
+        lambda: montar_recorte(
+            cubo, partner, mes, propriedade, unidade, canal)
+    )
 
-if canal:
-    df_f = df_f[df_f["canal"].isin(canal)]
+df_f = recorte["df_f"]
 
 if df_f.empty:
     st.warning("Nenhum dado encontrado para os filtros selecionados.")
+    painel_tempos(caches_do_painel())
     st.stop()
 
 # ======================
@@ -335,7 +412,7 @@ if df_f.empty:
 # ======================
 
 reservas, ocupacao, receita_total, receita_diarias, receita_limpeza = (
-    calcular_kpis(df_f, mes)
+    recorte["kpis"]
 )
 
 st.markdown("### 📌 Indicadores do Mês")
@@ -360,27 +437,71 @@ if unidade != "Todas":
     st.caption(f"Resumo operacional da unidade no mês {mes}")
 
 
-# se estiver filtrando unidade, não exibe gráfico agregado
-if unidade == "Todas" and propriedade != "Todos":
+def seletor_pagina(linhas, chave):
+    """
+    Número da página escolhida (1 se tudo cabe numa página). Com mais de
+    uma página, desenha o seletor e a legenda do trecho exibido.
+    """
+    paginas = total_paginas(linhas)
+    if paginas == 1:
+        return 1
+
+    numero = int(st.number_input(
+        f"Página (de {paginas})",
+        min_value=1,
+        max_value=paginas,
+        value=1,
+        step=1,
+        key=chave
+    ))
+    inicio = (numero - 1) * TAMANHO_PAGINA
+    st.caption(
+        f"Unidades {inicio + 1}–{min(inicio + TAMANHO_PAGINA, linhas)} "
+        f"de {linhas}"
+    )
+    return numero
+
+
+@st.fragment
+def secao_receita_unidade(receita_unidade, propriedade, filtros, versao):
     st.subheader("📊 Receita por Unidade")
-    grafico_df = (
-        df_f.groupby("unidade", as_index=False)
-        .agg(receita=("valor_mes", "sum"))
+
+    top_n = st.radio(
+        "Mostrar",
+        OPCOES_TOP_N,
+        index=1,
+        format_func=lambda n: f"Top {n} + outros" if n else "Todas",
+        horizontal=True
     )
-    fig = px.bar(
-        grafico_df,
-        x="unidade",
-        y="receita",
-        title=f"Receita por Unidade – {propriedade}"
+
+    fig = figura(
+        "fig_receita_unidade", filtros + (top_n,), versao,
+        lambda: px.bar(
+            top_n_com_outros(receita_unidade, "unidade", "receita", top_n),
+            x="unidade",
+            y="receita",
+            title=f"Receita por Unidade – {propriedade}"
+        )
     )
 
     st.plotly_chart(fig, use_container_width=True)
 
+
+# se estiver filtrando unidade, não exibe gráfico agregado
+if unidade == "Todas" and propriedade != "Todos":
+    with etapa("seção receita por unidade"):
+        secao_receita_unidade(
+            recorte["receita_unidade"], propriedade, filtros, versao_dados
+        )
+
 # ======================
 # 7.1 HISTÓRICO MENSAL (BARRAS) — UNIDADE
 # ======================
 
-if propriedade != "Todos" and unidade != "Todas":
+
+@st.fragment
+def secao_historico_unidade(propriedade, unidade, versao):
+    # toggle e gráficos reexecutam só esta seção
     ver_hist_unidade = st.toggle(
         "📊 Ver histórico mensal da unidade",
         value=False
@@ -390,76 +511,59 @@ if propriedade != "Todos" and unidade != "Todas":
         st.divider()
         st.subheader(f"📊 Histórico Mensal — {propriedade} | Unidade {unidade}")
 
-        hist = (
-            df[
-                (df["propriedade"] == propriedade) &
-                (df["unidade"] == unidade)
-            ]
-            .groupby(["mes", "mes_dt"], as_index=False)
-            .agg(
-                noites_ocupadas=("noites_mes", "sum"),
-                receita_total=("valor_mes", "sum"),
-                receita_limpeza=("limpeza_mes", "sum")
-            )
-            .sort_values("mes_dt")
-        )
-
-        hist["mes_fmt"] = (
-            pd.to_datetime(hist["mes"] + "-01")
-            .dt.strftime("%m-%Y")
-        )
-
-        hist["receita_diarias"] = hist["receita_total"] - \
-            hist["receita_limpeza"]
-
-        hist["dias_mes"] = (
-            pd.to_datetime(hist["mes"] + "-01")
-            .dt.days_in_month
-        )
-
-        hist["ocupacao"] = (hist["noites_ocupadas"] / hist["dias_mes"] * 100)
-        hist["ADR"] = (
-            hist["receita_diarias"] /
-            hist["noites_ocupadas"].replace(0, pd.NA)
-        )
-        hist["RevPAR"] = hist["ADR"] * (hist["ocupacao"] / 100)
+        # painel mensal pré-calculado: busca por chave, sem reagrupar
+        id_unidade = dimensao_unidades().id(propriedade, unidade)
+        hist = painel_unidades().obter(id_unidade)
+        filtros = (propriedade, unidade)
 
         col_h1, col_h2 = st.columns(2)
         with col_h1:
-            fig_rec = px.bar(
-                hist,
-                x="mes_fmt",
-                y="receita_total",
-                title="Receita Total (R$) — Fechamento Mensal",
-                text_auto=".2s"
+            fig_rec = figura(
+                "fig_rec", filtros, versao,
+                lambda: px.bar(
+                    hist,
+                    x="mes_fmt",
+                    y="receita_total",
+                    title="Receita Total (R$) — Fechamento Mensal",
+                    text_auto=".2s"
+                )
             )
             st.plotly_chart(fig_rec, use_container_width=True)
 
         with col_h2:
-            fig_occ = px.bar(
-                hist,
-                x="mes_fmt",
-                y="ocupacao",
-                title="Ocupação (%) — Fechamento Mensal",
-                text_auto=".1f"
+            fig_occ = figura(
+                "fig_occ", filtros, versao,
+                lambda: px.bar(
+                    hist,
+                    x="mes_fmt",
+                    y="ocupacao",
+                    title="Ocupação (%) — Fechamento Mensal",
+                    text_auto=".1f"
+                )
             )
             st.plotly_chart(fig_occ, use_container_width=True)
 
-        fig_adr = px.bar(
-            hist,
-            x="mes_fmt",
-            y="ADR",
-            title="ADR (R$) — Fechamento Mensal",
-            text_auto=".2f"
+        fig_adr = figura(
+            "fig_adr", filtros, versao,
+            lambda: px.bar(
+                hist,
+                x="mes_fmt",
+                y="ADR",
+                title="ADR (R$) — Fechamento Mensal",
+                text_auto=".2f"
+            )
         )
         st.plotly_chart(fig_adr, use_container_width=True)
 
-        fig_revpar = px.bar(
-            hist,
-            x="mes_fmt",
-            y="RevPAR",
-            title="RevPAR (R$) — Fechamento Mensal",
-            text_auto=".2f"
+        fig_revpar = figura(
+            "fig_revpar", filtros, versao,
+            lambda: px.bar(
+                hist,
+                x="mes_fmt",
+                y="RevPAR",
+                title="RevPAR (R$) — Fechamento Mensal",
+                text_auto=".2f"
+            )
         )
         st.plotly_chart(fig_revpar, use_container_width=True)
 
@@ -467,49 +571,33 @@ if propriedade != "Todos" and unidade != "Todas":
         # 🔥 HISTÓRICO DE NÍVEL DA UNIDADE
         # =============================
 
-        meta_linha = df_meta.loc[df_meta["unidade"]
-                                 == unidade, "receita_esperada"]
-
-        if not meta_linha.empty:
-            valor_bruto = str(meta_linha.iloc[0]).strip()
-            valor_bruto = (
-                valor_bruto.replace("R$", "")
-                .replace(".", "")
-                .replace(",", ".")
-            )
-
-            try:
-                receita_esperada = float(valor_bruto)
-            except ValueError:
-                receita_esperada = None
-
-            if receita_esperada and receita_esperada > 0:
-
-                def classificar_nivel(x):
-                    if x < 0.5:
-                        return 1
-                    elif x < 0.85:
-                        return 2
-                    elif x < 1:
-                        return 3
-                    elif x < 1.15:
-                        return 4
-                    else:
-                        return 5
-
-                hist["atingimento"] = hist["receita_diarias"] / receita_esperada
-                hist["nivel"] = hist["atingimento"].apply(classificar_nivel)
+        # meta pelo id_unidade, já numérica no índice
+        receita_esperada = indice_metas().meta(id_unidade)
+
+        if receita_esperada is not None:
+
+            if receita_esperada > 0:
+
+                def montar_nivel():
+                    hist_nivel = hist.copy()
+                    hist_nivel["atingimento"] = (
+                        hist_nivel["receita_diarias"] / receita_esperada
+                    )
+                    hist_nivel["nivel"], _ = classificar_niveis(
+                        hist_nivel["atingimento"]
+                    )
+                    return px.bar(
+                        hist_nivel,
+                        x="mes_fmt",
+                        y="nivel",
+                        title="Nível por Mês — Indicador de Performance",
+                        text_auto=True
+                    )
 
                 st.divider()
                 st.subheader("🎯 Histórico de Níveis")
 
-                fig_nivel = px.bar(
-                    hist,
-                    x="mes_fmt",
-                    y="nivel",
-                    title="Nível por Mês — Indicador de Performance",
-                    text_auto=True
-                )
+                fig_nivel = figura("fig_nivel", filtros, versao, montar_nivel)
                 st.plotly_chart(fig_nivel, use_container_width=True)
 
             else:
@@ -518,12 +606,18 @@ if propriedade != "Todos" and unidade != "Todas":
         else:
             st.warning("⚠️ Unidade não encontrada na aba 'Base Níveis'.")
 
+
+if propriedade != "Todos" and unidade != "Todas":
+    with etapa("seção histórico da unidade"):
+        secao_historico_unidade(propriedade, unidade, versao_dados)
+
 # ======================
 # 7.2 HISTÓRICO MENSAL (BARRAS) — PRÉDIO
 # ======================
 
-if propriedade != "Todos":
 
+@st.fragment
+def secao_historico_predio(propriedade, versao):
     ver_hist_predio = st.toggle(
         "📊 Ver histórico mensal do prédio",
         value=False
@@ -532,298 +626,243 @@ if propriedade != "Todos":
     if ver_hist_predio:
         st.divider()
         st.subheader(f"🏢 Histórico Mensal — {propriedade}")
-        hist_p = (
-            df[df["propriedade"] == propriedade]
-            .groupby(["mes", "mes_dt"], as_index=False)
-            .agg(
-                noites_ocupadas=("noites_mes", "sum"),
-                receita_total=("valor_mes", "sum"),
-                receita_limpeza=("limpeza_mes", "sum"),
-                unidades=("unidade", "nunique")
-            )
-            .sort_values("mes_dt")
-        )
-
-        hist_p["mes_fmt"] = (
-            pd.to_datetime(hist_p["mes"] + "-01")
-            .dt.strftime("%m-%Y")
-        )
-
-        hist_p["receita_diarias"] = hist_p["receita_total"] - \
-            hist_p["receita_limpeza"]
-
-        hist_p["dias_mes"] = (
-            pd.to_datetime(hist_p["mes"] + "-01")
-            .dt.days_in_month
-        )
-
-        hist_p["ocupacao"] = (
-            hist_p["noites_ocupadas"] /
-            (hist_p["dias_mes"] * hist_p["unidades"]) * 100
-        )
-
-        hist_p["ADR"] = (
-            hist_p["receita_diarias"] /
-            hist_p["noites_ocupadas"].replace(0, pd.NA)
-        )
+        # painel mensal pré-calculado (ocupação já por nº de unidades)
+        hist_p = painel_predios().obter(propriedade)
+        filtros = (propriedade,)
 
         col_p1, col_p2 = st.columns(2)
 
         with col_p1:
-            fig_rec_p = px.bar(
-                hist_p,
-                x="mes_fmt",
-                y="receita_total",
-                title="Receita Total (R$) — Prédio — Fechamento Mensal",
-                text_auto=".2s"
+            fig_rec_p = figura(
+                "fig_rec_p", filtros, versao,
+                lambda: px.bar(
+                    hist_p,
+                    x="mes_fmt",
+                    y="receita_total",
+                    title="Receita Total (R$) — Prédio — Fechamento Mensal",
+                    text_auto=".2s"
+                )
             )
             st.plotly_chart(fig_rec_p, use_container_width=True)
 
         with col_p2:
-            fig_occ_p = px.bar(
-                hist_p,
-                x="mes_fmt",
-                y="ocupacao",
-                title="Ocupação (%) — Prédio",
-                text_auto=".1f"
+            fig_occ_p = figura(
+                "fig_occ_p", filtros, versao,
+                lambda: px.bar(
+                    hist_p,
+                    x="mes_fmt",
+                    y="ocupacao",
+                    title="Ocupação (%) — Prédio",
+                    text_auto=".1f"
+                )
             )
             st.plotly_chart(fig_occ_p, use_container_width=True)
 
-            hist_p["RevPAR"] = hist_p["ADR"] * (hist_p["ocupacao"] / 100)
-
-        fig_adr_p = px.bar(
-            hist_p,
-            x="mes_fmt",
-            y="ADR",
-            title="ADR (R$) — Prédio — Fechamento Mensal",
-            text_auto=".2f"
+        fig_adr_p = figura(
+            "fig_adr_p", filtros, versao,
+            lambda: px.bar(
+                hist_p,
+                x="mes_fmt",
+                y="ADR",
+                title="ADR (R$) — Prédio — Fechamento Mensal",
+                text_auto=".2f"
+            )
         )
 
         st.plotly_chart(fig_adr_p, use_container_width=True)
 
-        fig_revpar_p = px.bar(
-            hist_p,
-            x="mes_fmt",
-            y="RevPAR",
-            title="RevPAR (R$) — Prédio — Fechamento Mensal",
-            text_auto=".2f"
+        fig_revpar_p = figura(
+            "fig_revpar_p", filtros, versao,
+            lambda: px.bar(
+                hist_p,
+                x="mes_fmt",
+                y="RevPAR",
+                title="RevPAR (R$) — Prédio — Fechamento Mensal",
+                text_auto=".2f"
+            )
         )
 
         st.plotly_chart(fig_revpar_p, use_container_width=True)
 
+
+if propriedade != "Todos":
+    with etapa("seção histórico do prédio"):
+        secao_historico_predio(propriedade, versao_dados)
+
 # ======================
 # 8. DETALHE POR UNIDADE
 # ======================
 
-st.divider()
-st.subheader("📋 Detalhe por Unidade")
-
-# --- calendário real do mês ---
-periodo = pd.Period(mes, freq="M")
-dias_no_mes = periodo.days_in_month
-
-# agregação principal (SEM ordenação por ranking)
-agg = (
-    df_f.groupby(["id_propriedade", "propriedade", "unidade"])
-    .agg(
-        reservas=("id_reserva", "nunique"),
-        noites_ocupadas=("noites_mes", "sum"),
-        receita_total=("valor_mes", "sum"),
-        receita_limpeza=("limpeza_mes", "sum")
-    )
-    .reset_index()
-)
 
-# métricas calculadas
-agg["receita_diarias"] = agg["receita_total"] - agg["receita_limpeza"]
-agg["ocupacao"] = (agg["noites_ocupadas"] / dias_no_mes) * 100
-agg["ADR"] = (
-    agg["receita_diarias"] /
-    agg["noites_ocupadas"].replace(0, pd.NA)
-)
-agg["RevPAR"] = agg["ADR"] * (agg["ocupacao"] / 100)
-
-# remove coluna técnica
-agg = agg.drop(columns=["noites_ocupadas"])
-
-# ordenação PADRÃO por ID (não ranking)
-agg = agg.sort_values(["id_propriedade", "unidade"])
-
-st.dataframe(
-    agg,
-    use_container_width=True,
-    column_config={
-        "ocupacao": st.column_config.NumberColumn(
-            "Ocupação (%)",
-            format="%.1f"
-        ),
-        "receita_total": st.column_config.NumberColumn(
-            "Receita Total",
-            format="R$ %.2f"
-        ),
-        "receita_diarias": st.column_config.NumberColumn(
-            "Receita Diárias",
-            format="R$ %.2f"
-        ),
-        "receita_limpeza": st.column_config.NumberColumn(
-            "Receita Limpeza",
-            format="R$ %.2f"
-        ),
-        "ADR": st.column_config.NumberColumn(
-            "ADR",
-            format="R$ %.2f"
-        ),
-        "RevPAR": st.column_config.NumberColumn(
-            "RevPAR",
-            format="R$ %.2f"
+@st.fragment
+def secao_detalhe(agg):
+    st.divider()
+    st.subheader("📋 Detalhe por Unidade")
+
+    numero = seletor_pagina(len(agg), "pagina_detalhe")
+
+    with etapa("tabela detalhe por unidade"):
+        st.dataframe(
+            pagina(agg, numero),
+            use_container_width=True,
+            column_config={
+                "ocupacao": st.column_config.NumberColumn(
+                    "Ocupação (%)",
+                    format="%.1f"
+                ),
+                "receita_total": st.column_config.NumberColumn(
+                    "Receita Total",
+                    format="R$ %.2f"
+                ),
+                "receita_diarias": st.column_config.NumberColumn(
+                    "Receita Diárias",
+                    format="R$ %.2f"
+                ),
+                "receita_limpeza": st.column_config.NumberColumn(
+                    "Receita Limpeza",
+                    format="R$ %.2f"
+                ),
+                "ADR": st.column_config.NumberColumn(
+                    "ADR",
+                    format="R$ %.2f"
+                ),
+                "RevPAR": st.column_config.NumberColumn(
+                    "RevPAR",
+                    format="R$ %.2f"
+                )
+            }
         )
-    }
-)
+
+
+with etapa("seção detalhe por unidade"):
+    secao_detalhe(recorte["agg"])
 
 # ======================
 # 9. SHARE DE CANAL
 # ======================
 
-st.divider()
-st.subheader("📊 Share de Canal (%)")
 
-canal_share = (
-    df_f.groupby("canal", as_index=False)["valor_mes"].sum()
-)
+@st.fragment
+def secao_share_canal(canal_share, filtros, versao):
+    st.divider()
+    st.subheader("📊 Share de Canal (%)")
+
+    def montar_share():
+        fig_share = px.pie(
+            canal_share,
+            names="canal",
+            values="valor_mes",
+            title="Participação de Receita por Canal",
+            hole=0.4,
+            color="canal",
+            color_discrete_map=CORES_CANAIS
+        )
 
-canal_share["share"] = (
-    canal_share["valor_mes"] / canal_share["valor_mes"].sum()
-)
+        fig_share.update_traces(
+            textinfo="label+percent",
+            hovertemplate=(
+                "Canal: %{label}<br>"
+                "Receita: R$ %{value:,.2f}<br>"
+                "Share: %{percent}"
+            )
+        )
+        return fig_share
 
-fig_share = px.pie(
-    canal_share,
-    names="canal",
-    values="valor_mes",
-    title="Participação de Receita por Canal",
-    hole=0.4,
-    color="canal",
-    color_discrete_map=CORES_CANAIS
-)
+    if canal_share.empty:
+        st.info("Sem dados para exibir o share de canal.")
+    else:
+        st.plotly_chart(
+            figura("fig_share", filtros, versao, montar_share),
+            use_container_width=True
+        )
 
-fig_share.update_traces(
-    textinfo="label+percent",
-    hovertemplate=(
-        "Canal: %{label}<br>"
-        "Receita: R$ %{value:,.2f}<br>"
-        "Share: %{percent}"
-    )
-)
 
-if canal_share.empty:
-    st.info("Sem dados para exibir o share de canal.")
-else:
-    st.plotly_chart(fig_share, use_container_width=True)
+with etapa("seção share de canal"):
+    secao_share_canal(recorte["canal_share"], filtros, versao_dados)
 
 
 # ======================
 # 10. RANKINGS
 # ======================
 
-st.divider()
-st.subheader("🏆 Ranking de Unidades")
-
-ranking_unidade = agg.copy()
-
-ranking_unidade = ranking_unidade.sort_values(
-    "receita_total", ascending=False)
-ranking_unidade = ranking_unidade[[
-    "id_propriedade",
-    "propriedade",
-    "unidade",
-    "receita_total",
-    "receita_diarias",
-    "receita_limpeza",
-    "ocupacao",
-    "ADR",
-    "RevPAR"
-]]
-
-ranking_unidade.insert(0, "rank", range(1, len(ranking_unidade) + 1))
-
-st.dataframe(
-    ranking_unidade,
-    use_container_width=True,
-    column_config={
-        "ocupacao": st.column_config.NumberColumn(
-            "Ocupação (%)",
-            format="%.1f"
-        ),
-        "receita_total": st.column_config.NumberColumn(
-            "Receita Total",
-            format="R$ %.2f"
-        ),
-        "receita_diarias": st.column_config.NumberColumn(
-            "Receita Diárias",
-            format="R$ %.2f"
-        ),
-        "receita_limpeza": st.column_config.NumberColumn(
-            "Receita Limpeza",
-            format="R$ %.2f"
-        ),
-        "ADR": st.column_config.NumberColumn(
-            "ADR",
-            format="R$ %.2f"
-        ),
-        "RevPAR": st.column_config.NumberColumn(
-            "RevPAR",
-            format="R$ %.2f"
-        )
-    }
-)
 
-st.divider()
-st.subheader("🏢 Ranking de Prédios")
-
-ranking_predio = (
-    agg.groupby(["id_propriedade", "propriedade"], as_index=False)
-    .agg(
-        receita_total=("receita_total", "sum"),
-        receita_diarias=("receita_diarias", "sum"),
-        receita_limpeza=("receita_limpeza", "sum"),
-        ocupacao_media=("ocupacao", "mean"),
-        ADR_medio=("ADR", "mean"),
-        RevPAR_medio=("RevPAR", "mean")
-    )
-)
+@st.fragment
+def secao_rankings(ranking_unidade, ranking_predio):
+    st.divider()
+    st.subheader("🏆 Ranking de Unidades")
+
+    numero = seletor_pagina(len(ranking_unidade), "pagina_ranking")
+
+    with etapa("tabela ranking de unidades"):
+        st.dataframe(
+            pagina_ranking(ranking_unidade, "receita_total", numero),
+            use_container_width=True,
+            column_config={
+                "ocupacao": st.column_config.NumberColumn(
+                    "Ocupação (%)",
+                    format="%.1f"
+                ),
+                "receita_total": st.column_config.NumberColumn(
+                    "Receita Total",
+                    format="R$ %.2f"
+                ),
+                "receita_diarias": st.column_config.NumberColumn(
+                    "Receita Diárias",
+                    format="R$ %.2f"
+                ),
+                "receita_limpeza": st.column_config.NumberColumn(
+                    "Receita Limpeza",
+                    format="R$ %.2f"
+                ),
+                "ADR": st.column_config.NumberColumn(
+                    "ADR",
+                    format="R$ %.2f"
+                ),
+                "RevPAR": st.column_config.NumberColumn(
+                    "RevPAR",
+                    format="R$ %.2f"
+                )
+            }
+        )
 
-ranking_predio = ranking_predio.sort_values("receita_total", ascending=False)
-ranking_predio.insert(0, "rank", range(1, len(ranking_predio) + 1))
-
-st.dataframe(
-    ranking_predio,
-    use_container_width=True,
-    column_config={
-        "ocupacao_media": st.column_config.NumberColumn(
-            "Ocupação Média (%)",
-            format="%.1f"
-        ),
-        "receita_total": st.column_config.NumberColumn(
-            "Receita Total",
-            format="R$ %.2f"
-        ),
-        "receita_diarias": st.column_config.NumberColumn(
-            "Receita Diárias",
-            format="R$ %.2f"
-        ),
-        "receita_limpeza": st.column_config.NumberColumn(
-            "Receita Limpeza",
-            format="R$ %.2f"
-        ),
-        "ADR_medio": st.column_config.NumberColumn(
-            "ADR Médio",
-            format="R$ %.2f"
-        ),
-        "RevPAR_medio": st.column_config.NumberColumn(
-            "RevPAR Médio",
-            format="R$ %.2f"
+    st.divider()
+    st.subheader("🏢 Ranking de Prédios")
+
+    with etapa("tabela ranking de prédios"):
+        st.dataframe(
+            ranking_predio,
+            use_container_width=True,
+            column_config={
+                "ocupacao_media": st.column_config.NumberColumn(
+                    "Ocupação Média (%)",
+                    format="%.1f"
+                ),
+                "receita_total": st.column_config.NumberColumn(
+                    "Receita Total",
+                    format="R$ %.2f"
+                ),
+                "receita_diarias": st.column_config.NumberColumn(
+                    "Receita Diárias",
+                    format="R$ %.2f"
+                ),
+                "receita_limpeza": st.column_config.NumberColumn(
+                    "Receita Limpeza",
+                    format="R$ %.2f"
+                ),
+                "ADR_medio": st.column_config.NumberColumn(
+                    "ADR Médio",
+                    format="R$ %.2f"
+                ),
+                "RevPAR_medio": st.column_config.NumberColumn(
+                    "RevPAR Médio",
+                    format="R$ %.2f"
+                )
+            }
         )
-    }
-)
+
+
+with etapa("seção rankings"):
+    secao_rankings(recorte["ranking_unidade"], recorte["ranking_predio"])
 
 # ======================
 # 11. MÉTRICAS AVANÇADAS (OK)
@@ -839,3 +878,5 @@ st.dataframe(
 # - ADR = receita_diarias / noites
 # - Receita por unidade disponível (RevPAR)
 # - Participação % por canal
+
+painel_tempos(caches_do_painel())
@@ -0,0 +1,135 @@
+"""
+Verifica a carga paralela e a deduplicação do BaseDados (dados.py)
+contra a planilha local de planilha_fake.py, sem acesso ao Sheets.
+
+Uso:
+    python bi_reservas/bench_carga.py
+"""
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import dados
+from dados import HISTORICO, METAS, PREPARADORES, RESERVAS, BaseDados
+from planilha_fake import PlanilhaFake
+
+ATRASOS = {
+    "Reservas": 0.6,
+    "Histórico Unidades": 0.4,
+    "Base Níveis": 0.2,
+}
+SESSOES = 8
+
+
+def base_sem_snapshot(planilha):
+    # pasta vazia a cada caso: toda carga vai à "planilha"
+    dados.PASTA_SNAPSHOT = Path(tempfile.mkdtemp())
+    return BaseDados(planilha, "Reservas")
+
+
+def carga_paralela():
+    base = base_sem_snapshot(PlanilhaFake(ATRASOS))
+
+    inicio = time.perf_counter()
+    base.tabelas([RESERVAS, HISTORICO, METAS])
+    decorrido = time.perf_counter() - inicio
+
+    # cada aba faz get_all_values + batch_get: 2 atrasos por aba
+    mais_lenta = 2 * max(ATRASOS.values())
+    em_serie = 2 * sum(ATRASOS.values())
+    print(
+        f"3 abas: {decorrido:.2f} s | aba mais lenta {mais_lenta:.2f} s | "
+        f"em série seria {em_serie:.2f} s"
+    )
+    assert decorrido < mais_lenta + 0.5 * (em_serie - mais_lenta)
+
+
+def cargas_coalescidas():
+    planilha = PlanilhaFake(ATRASOS)
+    base = base_sem_snapshot(planilha)
+
+    barreira = threading.Barrier(SESSOES)
+
+    def sessao():
+        barreira.wait()
+        base.tabelas([RESERVAS])
+
+    threads = [threading.Thread(target=sessao) for _ in range(SESSOES)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    contadores = base.estatisticas()
+    leituras = planilha.worksheet("Reservas").leituras
+    print(
+        f"{SESSOES} sessões a frio: {leituras} leitura(s) da aba | "
+        f"contadores {contadores}"
+    )
+    assert leituras == 1
+    assert contadores["cargas"] == 1
+    assert contadores["coalescidas"] == SESSOES - 1
+    assert contadores["atualizacoes"] == 0
+
+
+def derivados_coalescidos():
+    base = base_sem_snapshot(PlanilhaFake())
+    calculos = []
+
+    def cubo_lento(df):
+        calculos.append(1)
+        time.sleep(0.3)
+        return len(df)
+
+    barreira = threading.Barrier(SESSOES)
+
+    def sessao():
+        barreira.wait()
+        base.derivado("cubo", [RESERVAS], cubo_lento)
+
+    threads = [threading.Thread(target=sessao) for _ in range(SESSOES)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    contadores = base.estatisticas()
+    print(
+        f"{SESSOES} sessões pedindo o mesmo derivado: "
+        f"{len(calculos)} cálculo(s) | "
+        f"coalescidos {contadores['derivados_coalescidos']}"
+    )
+    assert len(calculos) == 1
+    assert contadores["derivados_coalescidos"] == SESSOES - 1
+
+
+def valores_sem_formatacao():
+    # mesmo resultado lendo números brutos (com textos misturados) ou só
+    # os valores formatados
+    planilha = PlanilhaFake()
+    base = BaseDados(planilha, "Reservas")
+
+    for nome in PREPARADORES:
+        ws = planilha.worksheet(base.abas[nome])
+        dados.NUMEROS_SEM_FORMATACAO = True
+        brutos = PREPARADORES[nome](ws)
+        dados.NUMEROS_SEM_FORMATACAO = False
+        formatados = PREPARADORES[nome](ws)
+        dados.NUMEROS_SEM_FORMATACAO = True
+
+        pd.testing.assert_frame_equal(brutos, formatados)
+        print(f"{nome}: sem formatação = formatado ({len(brutos)} linhas)")
+
+
+def main():
+    valores_sem_formatacao()
+    carga_paralela()
+    cargas_coalescidas()
+    derivados_coalescidos()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Micro-benchmark do parse_brl (dados.py) contra a implementação anterior.
+
+Uso:
+    python bi_reservas/bench_parse_brl.py [linhas]
+"""
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from dados import parse_brl
+
+
+def parse_brl_antigo(series):
+    # cadeia de str.replace usada antes em app.py / dashrev.py
+    return (
+        series.astype(str)
+        .str.strip()
+        .str.replace("\u00a0", "", regex=False)
+        .str.replace(".", "", regex=False)
+        .str.replace(",", ".", regex=False)
+        .str.replace(r"[^\d.-]", "", regex=True)
+        .replace("", "0")
+        .pipe(pd.to_numeric, errors="coerce")
+        .fillna(0.0)
+    )
+
+
+def gerar_coluna(linhas, distintos):
+    rng = np.random.default_rng(42)
+    valores = rng.integers(0, 500_000, distintos) / 100
+    textos = [
+        "R$ " + f"{v:,.2f}".replace(",", "X")
+        .replace(".", ",").replace("X", ".")
+        for v in valores
+    ]
+    return pd.Series(rng.choice(textos, linhas), name="valor_mes")
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+    # receita: muitos valores distintos / limpeza: poucas taxas repetidas
+    for nome, distintos in [("valor_mes", linhas // 2), ("limpeza_mes", 40)]:
+        serie = gerar_coluna(linhas, distintos)
+
+        assert np.allclose(parse_brl(serie), parse_brl_antigo(serie))
+
+        antigo = min(timeit.repeat(
+            lambda: parse_brl_antigo(serie), number=5, repeat=3)) / 5
+        novo = min(timeit.repeat(
+            lambda: parse_brl(serie), number=5, repeat=3)) / 5
+
+        print(
+            f"{nome:<12} {linhas:>8} linhas {distintos:>8} distintos | "
+            f"antigo {antigo * 1000:8.1f} ms | novo {novo * 1000:8.1f} ms | "
+            f"{antigo / novo:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
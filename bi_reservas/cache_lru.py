@@ -0,0 +1,77 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def tamanho_bytes(valor):
+    """Estimativa de memória de DataFrames/Series e coleções deles."""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, dict):
+        return sum(tamanho_bytes(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sum(tamanho_bytes(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+class CacheLRU:
+    """
+    Cache LRU limitado por bytes e seguro entre threads (sessões).
+
+    Os valores guardados são compartilhados: quem lê não deve alterá-los.
+    """
+
+    def __init__(self, limite_bytes, medir=tamanho_bytes):
+        self.limite_bytes = limite_bytes
+        self.medir = medir
+        self._itens = OrderedDict()  # chave -> (valor, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.despejos = 0
+
+    def obter(self, chave, calcular):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return self._itens[chave][0]
+            self.misses += 1
+
+        valor = calcular()
+        tamanho = self.medir(valor)
+
+        with self._lock:
+            # maior que o orçamento inteiro: não guarda
+            if tamanho > self.limite_bytes:
+                return valor
+
+            if chave in self._itens:
+                # outra sessão calculou ao mesmo tempo
+                return self._itens[chave][0]
+
+            self._itens[chave] = (valor, tamanho)
+            self._bytes += tamanho
+
+            while self._bytes > self.limite_bytes:
+                _, (_, liberado) = self._itens.popitem(last=False)
+                self._bytes -= liberado
+                self.despejos += 1
+
+        return valor
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "itens": len(self._itens),
+                "bytes": self._bytes,
+                "limite_bytes": self.limite_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "despejos": self.despejos,
+            }
@@ -0,0 +1,988 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+log = logging.getLogger(__name__)
+
+# ======================
+# CAMADA DE DADOS COMPARTILHADA
+# ======================
+# Uma única carga do Google Sheets por ciclo de TTL, compartilhada entre
+# as páginas. Cada aba é baixada e normalizada uma vez e mantida em
+# memória; as páginas pedem só as tabelas que usam e devem tratá-las
+# como somente leitura.
+
+TTL_SEGUNDOS = 3600
+
+# True: aba vencida continua sendo servida enquanto a nova é baixada em
+# segundo plano (stale-while-revalidate). False: a sessão espera a recarga.
+ATUALIZA_EM_SEGUNDO_PLANO = True
+
+# True: colunas de valor/quantidade são pedidas ao Sheets sem formatação
+# (números prontos); só células que ainda chegarem como texto passam
+# pelo parse_brl. False: tudo vem formatado ("R$ 1.234,56").
+NUMEROS_SEM_FORMATACAO = True
+
+RESERVAS = "reservas"
+HISTORICO = "historico"
+METAS = "metas"
+
+ABA_HISTORICO = "Histórico Unidades"
+ABA_METAS = "Base Níveis"
+
+# snapshot em disco (Feather) para partir rápido após restart/deploy
+PASTA_SNAPSHOT = Path(os.environ.get(
+    "BI_RESERVAS_SNAPSHOT_DIR",
+    Path(tempfile.gettempdir()) / "bi_reservas"
+))
+IDADE_MAX_SNAPSHOT = pd.Timedelta(hours=24)
+
+# versão do formato das tabelas preparadas, gravada nos metadados do
+# snapshot: INCREMENTE ao mudar a saída de algum _preparar_* (colunas,
+# tipos), para o deploy ignorar os snapshots antigos em vez de servi-los
+VERSAO_SNAPSHOT = 1
+_CHAVE_VERSAO = b"bi_reservas_versao_snapshot"
+COLUNAS_PERIODO = ["mes_dt"]
+
+
+# ======================
+# NORMALIZAÇÃO — FUNÇÕES
+# ======================
+
+
+# tudo que não é dígito, vírgula ou sinal: R$, espaços (inclusive o
+# invisível \u00a0), texto e o ponto de milhar
+_RE_NAO_NUMERICO = re.compile(r"[^\d,\-]")
+
+# zero no formato contábil do Sheets ("R$ -", " - ") ou célula vazia,
+# já sem espaços
+_RE_ZERO = re.compile(r"(?:R\$)?-?")
+
+# coluna -> (qtd de células, exemplos) da última conversão
+_avisos_parse = {}
+
+# tabela -> {"leitura": s, "normalizacao": s} da última carga do Sheets
+_tempos_carga = {}
+
+# por thread: segundos de leitura da aba em carga (threads do _executor)
+# e origem das tabelas desde reiniciar_origem_tabelas (thread da sessão)
+_local = threading.local()
+
+
+def parse_brl(series):
+    """
+    "R$ 1.234,56" -> 1234.56. Cada texto distinto é convertido uma única
+    vez (valores repetidos, como taxas de limpeza, saem de graça).
+
+    Células vazias e o zero contábil ("R$ -") viram 0. Células que não
+    formam número (inclusive textos sem dígito, como "#N/A") também
+    viram 0, mas ficam registradas em `avisos_parse()`.
+    """
+    codigos, unicos = pd.factorize(series.astype(str), sort=False)
+
+    # limpeza e conversão vetorizadas sobre os textos distintos; o
+    # padrão vai como texto para o pandas usar o motor regex do Arrow
+    textos = pd.Series(unicos, dtype="str")
+    limpos = textos.str.replace(_RE_NAO_NUMERICO.pattern, "", regex=True)
+    convertidos = pd.to_numeric(
+        limpos.str.replace(",", ".", regex=False),
+        errors="coerce"
+    ).to_numpy(dtype=float, copy=True)
+
+    # sem nenhum dígito: só vazio e "R$ -" valem 0 ("#N/A" é inválido)
+    sem_digitos = limpos.isin(["", "-"]).to_numpy()
+    convertidos[sem_digitos] = [
+        0.0 if _RE_ZERO.fullmatch("".join(texto.split())) else np.nan
+        for texto in textos[sem_digitos]
+    ]
+
+    invalidos = np.isnan(convertidos)
+    if invalidos.any():
+        qtd = int(invalidos[codigos].sum())
+        exemplos = list(unicos[invalidos][:3])
+        _avisos_parse[series.name] = (qtd, exemplos)
+        log.warning(
+            "%s: %d célula(s) não numérica(s), ex.: %s",
+            series.name, qtd, exemplos
+        )
+        convertidos[invalidos] = 0.0
+    else:
+        _avisos_parse.pop(series.name, None)
+
+    return pd.Series(
+        convertidos[codigos],
+        index=series.index,
+        name=series.name
+    )
+
+
+def avisos_parse():
+    """Colunas com células não numéricas na última carga."""
+    return dict(_avisos_parse)
+
+
+def _parse_quantidade(series):
+    return (
+        series
+        .astype(str)
+        .str.strip()
+        .str.replace(",", ".")
+        .replace("", "0")
+        .astype(float)
+    )
+
+
+def parse_numero(series, parser=parse_brl):
+    """
+    Converte uma coluna que mistura números (valores sem formatação) e
+    textos: os números passam direto e só os textos vão para `parser`.
+
+    O aviso da coluna em `avisos_parse()` é refeito a cada conversão
+    (sem textos, o da carga anterior é descartado).
+    """
+    _avisos_parse.pop(series.name, None)
+
+    eh_texto = series.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+
+    resultado = pd.to_numeric(
+        series.where(~eh_texto),
+        errors="coerce"
+    ).astype(float)
+
+    if eh_texto.any():
+        resultado[eh_texto] = parser(series[eh_texto]).to_numpy()
+
+    return resultado.fillna(0.0)
+
+
+def _somente_digitos(series):
+    return (
+        series
+        .astype(str)
+        .str.replace(r"\D", "", regex=True)
+        .astype(int)
+    )
+
+
+def _limpar_cabecalho(cabecalho, minusculas=False):
+    cabecalho = [str(c).strip() for c in cabecalho]
+    if minusculas:
+        cabecalho = [c.lower() for c in cabecalho]
+    return cabecalho
+
+
+def _nomes_unicos(cabecalho):
+    """
+    Repetições (inclusive células vazias) ganham sufixo ".1", ".2"...
+    A primeira ocorrência mantém o nome, como no read_csv do pandas.
+    """
+    vistos = {}
+    nomes = []
+    renomeadas = []
+    for nome in cabecalho:
+        if nome in vistos:
+            vistos[nome] += 1
+            novo = f"{nome}.{vistos[nome]}"
+            renomeadas.append((nome, novo))
+            nomes.append(novo)
+        else:
+            vistos[nome] = 0
+            nomes.append(nome)
+
+    if renomeadas:
+        log.warning("Cabeçalho com nomes repetidos renomeados: %s", renomeadas)
+    return nomes
+
+
+def _grade_para_df(valores, minusculas=False):
+    """
+    Monta o DataFrame direto da grade de `get_all_values()`, coluna a
+    coluna, sem criar um dict por linha como `get_all_records()`.
+    Cabeçalho limpo (strip / lower) uma única vez; todas as colunas são
+    mantidas, na ordem da aba (nomes repetidos ganham sufixo).
+    """
+    if not valores:
+        return pd.DataFrame()
+
+    cabecalho = _nomes_unicos(_limpar_cabecalho(valores[0], minusculas))
+
+    linhas = valores[1:]
+    if not linhas:
+        return pd.DataFrame(columns=cabecalho)
+
+    # gspread devolve todas as linhas com a largura do cabeçalho
+    colunas = zip(*linhas)
+    return pd.DataFrame(
+        {
+            nome: np.array(coluna, dtype=object)
+            for nome, coluna in zip(cabecalho, colunas)
+        },
+        copy=False
+    )
+
+
+def _letra_coluna(indice):
+    # 0 -> "A", 25 -> "Z", 26 -> "AA"
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord("A") + resto) + letras
+    return letras
+
+
+def _trocar_por_valores_brutos(ws, df, posicoes, minusculas=False):
+    """
+    Substitui as colunas de `df` pelos valores sem formatação da aba, numa
+    única chamada batch_get só com essas colunas. `posicoes`: coluna ->
+    índice no cabeçalho bruto da aba. Bloco cujo cabeçalho não bate com
+    a coluna esperada é descartado (fica o valor formatado).
+    """
+    colunas = list(posicoes)
+    faixas = [
+        f"{_letra_coluna(i)}:{_letra_coluna(i)}" for i in posicoes.values()
+    ]
+
+    blocos = ws.batch_get(
+        faixas,
+        major_dimension="COLUMNS",
+        value_render_option="UNFORMATTED_VALUE",
+        date_time_render_option="FORMATTED_STRING"
+    )
+
+    total = len(df)
+    for col, faixa, bloco in zip(colunas, faixas, blocos):
+        # 1ª célula é o cabeçalho; o Sheets corta vazios no fim da coluna
+        cabecalho = bloco[0][:1] if bloco else []
+        if _limpar_cabecalho(cabecalho, minusculas) != [col]:
+            log.warning(
+                "%s: faixa %s veio com cabeçalho %s; mantendo valores "
+                "formatados", col, faixa, cabecalho
+            )
+            continue
+
+        valores = list(bloco[0][1:])
+        valores += [""] * (total - len(valores))
+        df[col] = np.array(valores[:total], dtype=object)
+
+
+def _ler_aba(ws, numericas=(), minusculas=False):
+    inicio = time.perf_counter()
+    valores = ws.get_all_values()
+    df = _grade_para_df(valores, minusculas)
+
+    # letra da coluna vem do cabeçalho bruto da aba: no df, cabeçalhos
+    # repetidos/vazios foram renomeados e não servem de referência
+    cabecalho = _limpar_cabecalho(valores[0], minusculas) if valores else []
+    posicoes = {
+        col: cabecalho.index(col) for col in numericas if col in cabecalho
+    }
+    if NUMEROS_SEM_FORMATACAO and posicoes and not df.empty:
+        try:
+            _trocar_por_valores_brutos(ws, df, posicoes, minusculas)
+        except Exception:
+            # segue com os valores formatados (parse_brl cobre)
+            log.warning(
+                "Falha ao ler valores sem formatação de %s", list(posicoes),
+                exc_info=True
+            )
+
+    _local.leitura = time.perf_counter() - inicio
+    return df
+
+
+def _textos_como_str(df):
+    # garante colunas de texto homogêneas (ex.: unidade 101 / "101A");
+    # como texto, filtros, merges e o snapshot Arrow ficam consistentes
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].astype(str)
+    return df
+
+
+# tabela -> (bytes antes, bytes depois) da compactação de tipos
+_memoria = {}
+
+
+def _compactar(df, nome, categorias=(), inteiros=()):
+    """
+    Dimensões repetidas viram categóricas (groupby sobre códigos
+    inteiros) e inteiros são reduzidos ao menor tipo que comporta os
+    valores. Valores monetários seguem em float64 para não perder
+    centavos nas somas.
+    """
+    antes = df.memory_usage(deep=True).sum()
+
+    for col in categorias:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
+    for col in inteiros:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+
+    depois = df.memory_usage(deep=True).sum()
+    _memoria[nome] = (int(antes), int(depois))
+    log.info(
+        "%s: %.1f MB -> %.1f MB", nome, antes / 1e6, depois / 1e6
+    )
+
+    return df
+
+
+def memoria_tabelas():
+    """Memória (bytes antes, depois) de cada tabela na última carga."""
+    return dict(_memoria)
+
+
+def tempos_carga():
+    """Segundos de leitura (Sheets) e normalização da última carga."""
+    return {nome: dict(tempos) for nome, tempos in _tempos_carga.items()}
+
+
+# ======================
+# PREPARAÇÃO POR ABA
+# ======================
+
+
+def _preparar_reservas(ws_res):
+    df = _ler_aba(
+        ws_res,
+        numericas=["valor_mes", "limpeza_mes", "noites_mes"]
+    )
+
+    df["partner"] = df["partner"].astype(str).str.strip()
+    df["mes_dt"] = pd.to_datetime(
+        df["mes"].astype(str),
+        errors="coerce"
+    ).dt.to_period("M")
+
+    # colunas monetárias (BRL)
+    df["valor_mes"] = parse_numero(df["valor_mes"])
+    df["limpeza_mes"] = parse_numero(df["limpeza_mes"])
+
+    # noites = quantidade (NÃO moeda)
+    df["noites_mes"] = (
+        parse_numero(df["noites_mes"], _parse_quantidade)
+        .astype(int)
+    )
+
+    # IDs (inteiros simples, sem nullable)
+    df["id_reserva"] = _somente_digitos(df["id_reserva"])
+    df["id_propriedade"] = _somente_digitos(df["id_propriedade"])
+
+    return _compactar(
+        _textos_como_str(df),
+        RESERVAS,
+        categorias=["partner", "propriedade", "unidade", "canal"],
+        inteiros=["noites_mes", "id_reserva", "id_propriedade"]
+    )
+
+
+def _preparar_historico(ws_hist):
+    # nomes padronizados (lower) para bater com reservas
+    df = _ler_aba(
+        ws_hist,
+        numericas=[
+            "cleaning_revenue", "adm_360",
+            "price_less_comission", "plclcadm"
+        ],
+        minusculas=True
+    )
+
+    df["partnership"] = df["partnership"].astype(str).str.strip()
+    df["plclcadm"] = df["plclcadm"].fillna(0)
+
+    df["mes_dt"] = pd.to_datetime(
+        df["mês"].astype(str),
+        errors="coerce"
+    ).dt.to_period("M")
+
+    df["cleaning_revenue"] = parse_numero(df["cleaning_revenue"])
+    df["adm_360"] = parse_numero(df["adm_360"])
+    df["price_less_comission"] = parse_numero(df["price_less_comission"])
+    df["plclcadm"] = parse_numero(df["plclcadm"])
+
+    return _compactar(
+        _textos_como_str(df),
+        HISTORICO,
+        categorias=["partnership", "propriedade", "unidade"]
+    )
+
+
+def _preparar_metas(ws_meta):
+    df = _ler_aba(
+        ws_meta,
+        numericas=["receita_esperada"],
+        minusculas=True
+    )
+
+    df["receita_esperada"] = parse_numero(df["receita_esperada"])
+
+    return _textos_como_str(df)
+
+
+PREPARADORES = {
+    RESERVAS: _preparar_reservas,
+    HISTORICO: _preparar_historico,
+    METAS: _preparar_metas,
+}
+
+# uma thread por aba: a carga a frio dura o tempo da aba mais lenta
+_executor = ThreadPoolExecutor(
+    max_workers=len(PREPARADORES),
+    thread_name_prefix="carga-sheets"
+)
+
+
+# ======================
+# SNAPSHOT EM DISCO
+# ======================
+
+
+def _caminho_snapshot(nome, origem):
+    # `origem` (planilha + aba) no nome: deploys que apontam para
+    # planilhas diferentes não compartilham arquivos na mesma pasta
+    sufixo = hashlib.sha1(origem.encode()).hexdigest()[:12]
+    return PASTA_SNAPSHOT / f"{nome}-{sufixo}.feather"
+
+
+def salvar_snapshot(nome, origem, df):
+    import pyarrow as pa
+    from pyarrow import feather
+
+    df = df.copy(deep=False)
+    for col in COLUNAS_PERIODO:
+        if col in df.columns:
+            df[col] = df[col].dt.to_timestamp()
+
+    PASTA_SNAPSHOT.mkdir(parents=True, exist_ok=True)
+    destino = _caminho_snapshot(nome, origem)
+    tmp = destino.with_name(destino.name + ".tmp")
+
+    tabela = pa.Table.from_pandas(df)
+    tabela = tabela.replace_schema_metadata({
+        **(tabela.schema.metadata or {}),
+        _CHAVE_VERSAO: str(VERSAO_SNAPSHOT).encode(),
+    })
+
+    # sem compressão para poder ler com memory map
+    feather.write_feather(tabela, tmp, compression="uncompressed")
+    os.replace(tmp, destino)
+
+
+def ler_snapshot(nome, origem):
+    """
+    Retorna (df, salvo_em) do snapshot da aba vinda de `origem`, ou None
+    se não existir, for mais antigo que IDADE_MAX_SNAPSHOT ou tiver sido
+    gravado em outro formato (VERSAO_SNAPSHOT).
+    """
+    from pyarrow import feather
+
+    caminho = _caminho_snapshot(nome, origem)
+    if not caminho.exists():
+        return None
+
+    salvo_em = pd.Timestamp.fromtimestamp(caminho.stat().st_mtime)
+    if pd.Timestamp.now() - salvo_em > IDADE_MAX_SNAPSHOT:
+        return None
+
+    tabela = feather.read_table(caminho, memory_map=True)
+    versao = (tabela.schema.metadata or {}).get(_CHAVE_VERSAO, b"").decode()
+    if versao != str(VERSAO_SNAPSHOT):
+        log.info(
+            "Snapshot de %s é de outra versão (%s); ignorado",
+            nome, versao or "sem versão"
+        )
+        return None
+
+    df = tabela.to_pandas()
+    for col in COLUNAS_PERIODO:
+        if col in df.columns:
+            df[col] = df[col].dt.to_period("M")
+
+    return df, salvo_em
+
+
+# ======================
+# DIMENSÃO DE UNIDADES (CHAVE INTEIRA)
+# ======================
+
+COLUNAS_UNIDADE = ["propriedade", "unidade"]
+
+
+def _grafia_normalizada(texto):
+    # o que costuma divergir entre abas: caixa e espaços
+    return " ".join(str(texto).split()).casefold()
+
+
+class DimensaoUnidades:
+    """
+    Chave inteira `id_unidade` para cada par (propriedade, unidade) de
+    qualquer aba. Os ids só crescem: o mesmo par mantém o id entre
+    recargas no processo, então tabelas de versões diferentes continuam
+    comparáveis pela chave.
+
+    Pares que diferem só por caixa/espaços entre abas (ex.: "Ed. Sol" /
+    "ed. sol ") recebem ids distintos e são reportados uma vez no log e
+    em `divergencias()`.
+    """
+
+    def __init__(self):
+        self.ids = {}            # (propriedade, unidade) -> id
+        self.pares = []          # id -> (propriedade, unidade)
+        self.por_tabela = {}     # tabela -> ids presentes na última carga
+        self._reportadas = set()
+        self._divergentes = []   # textos, recalculados a cada chavear
+        self._lock = threading.Lock()
+
+    def chavear(self, nome, df):
+        """Acrescenta `id_unidade` (int32) a `df`, registrando pares novos."""
+        if not set(COLUNAS_UNIDADE) <= set(df.columns):
+            return df
+
+        # trabalha sobre os pares distintos (códigos das categóricas);
+        # célula vazia (código -1) vira o texto ""
+        codigos, categorias = [], []
+        for col in COLUNAS_UNIDADE:
+            cat = df[col].astype("category").cat
+            vazio = len(cat.categories)
+            codigos.append(
+                np.where(cat.codes < 0, vazio, cat.codes).astype(np.int64)
+            )
+            categorias.append(np.append(cat.categories.astype(str), ""))
+
+        largura = len(categorias[1])
+        distintos, posicoes = np.unique(
+            codigos[0] * largura + codigos[1], return_inverse=True
+        )
+        pares = zip(
+            categorias[0][distintos // largura].tolist(),
+            categorias[1][distintos % largura].tolist()
+        )
+
+        with self._lock:
+            ids = np.array(
+                [self._registrar(par) for par in pares], dtype=np.int32
+            )
+            self.por_tabela[nome] = set(ids.tolist())
+            divergencias = self._divergencias()
+            novas = [
+                texto for grafias, texto in divergencias.items()
+                if grafias not in self._reportadas
+            ]
+            self._reportadas.update(divergencias)
+            self._divergentes = sorted(divergencias.values())
+
+        for texto in sorted(novas):
+            log.warning("Grafias divergentes de unidade: %s", texto)
+
+        df["id_unidade"] = ids[posicoes.reshape(-1)]
+        return df
+
+    def _registrar(self, par):
+        # chamado com self._lock adquirido
+        id_ = self.ids.get(par)
+        if id_ is None:
+            id_ = len(self.pares)
+            self.ids[par] = id_
+            self.pares.append(par)
+        return id_
+
+    def _divergencias(self):
+        # chamado com self._lock adquirido
+        # {grafias do grupo: texto}, com as abas em que cada grafia aparece
+        grupos = {}
+        for nome, ids in self.por_tabela.items():
+            for id_ in ids:
+                propriedade, unidade = self.pares[id_]
+                normal = (
+                    _grafia_normalizada(propriedade),
+                    _grafia_normalizada(unidade)
+                )
+                grupos.setdefault(normal, {}).setdefault(
+                    (propriedade, unidade), set()
+                ).add(nome)
+
+        return {
+            frozenset(grafias): " × ".join(
+                f"'{p} / {u}' ({', '.join(sorted(abas))})"
+                for (p, u), abas in sorted(grafias.items())
+            )
+            for grafias in grupos.values()
+            if len(grafias) > 1
+        }
+
+    def divergencias(self):
+        """
+        Pares com grafias divergentes nas cargas atuais das abas
+        (calculados na carga, em `chavear`).
+        """
+        with self._lock:
+            return list(self._divergentes)
+
+    def id(self, propriedade, unidade):
+        """id_unidade do par; None se ele não aparece em nenhuma aba."""
+        return self.ids.get((str(propriedade), str(unidade)))
+
+    def nomes(self, ids):
+        """DataFrame (propriedade, unidade) na ordem de `ids`."""
+        with self._lock:
+            pares = [self.pares[i] for i in ids]
+        return pd.DataFrame(pares, columns=COLUNAS_UNIDADE)
+
+
+# ======================
+# BASE EM MEMÓRIA
+# ======================
+
+
+class BaseDados:
+    """
+    Tabelas normalizadas de uma mesma carga do Google Sheets.
+
+    Cada aba é baixada na primeira vez em que alguma página a pede e
+    reaproveitada por todas as sessões. Abas pedidas juntas são baixadas
+    em paralelo. Passado TTL_SEGUNDOS, a aba é recarregada; com
+    ATUALIZA_EM_SEGUNDO_PLANO a versão anterior segue sendo servida até a
+    nova ficar pronta e ser trocada de uma vez.
+
+    Sessões que pedem uma aba já em carga esperam o mesmo download
+    (single-flight); `contadores` registra quantas chamadas foram
+    deduplicadas assim.
+
+    Se houver snapshot recente em disco, a aba parte dele e é atualizada
+    a partir do Sheets em segundo plano; `atualizado_em` guarda a data
+    dos dados servidos por aba.
+
+    Toda aba com propriedade/unidade ganha a coluna `id_unidade`, chave
+    inteira comum às três abas (ver DimensaoUnidades).
+
+    Cada troca de DataFrame incrementa a versão da aba; `derivado()`
+    guarda estruturas calculadas a partir das tabelas (índices, cubos)
+    e as refaz só quando alguma versão muda.
+
+    `planilha` é qualquer objeto com `.worksheet(nome)` (a Spreadsheet do
+    gspread ou a PlanilhaFake de planilha_fake.py), cujas abas expõem
+    `get_all_values()` e `batch_get()`. bench_carga.py usa o fake para
+    checar a carga paralela e a deduplicação.
+    """
+
+    def __init__(self, planilha, aba_reservas):
+        self.planilha = planilha
+        self.abas = {
+            RESERVAS: aba_reservas,
+            HISTORICO: ABA_HISTORICO,
+            METAS: ABA_METAS,
+        }
+        self.atualizado_em = {}
+        self._futuros = {}
+        self._versoes = {}
+        self._derivados = {}
+        self._atualizando = set()
+        self._lock = threading.Lock()
+        self.unidades = DimensaoUnidades()
+        self.contadores = {
+            "cargas": 0,             # downloads iniciados a frio
+            "coalescidas": 0,        # esperaram uma carga já em andamento
+            "em_memoria": 0,         # servidas direto da memória
+            "atualizacoes": 0,       # recargas disparadas (TTL/snapshot)
+            "atualizacoes_coalescidas": 0,  # recarga já estava rodando
+            "derivados_coalescidos": 0,     # esperaram um derivado em cálculo
+        }
+
+    def _origem(self, nome):
+        # planilha (id do gspread; vazio no fake) + aba, para o snapshot
+        return f"{getattr(self.planilha, 'id', '')}/{self.abas[nome]}"
+
+    def _definir(self, nome, futuro):
+        # chamado com self._lock adquirido
+        self._futuros[nome] = futuro
+        self._versoes[nome] = self._versoes.get(nome, 0) + 1
+
+    def _baixar(self, nome):
+        """
+        (df, baixado_em) recém-lidos do Sheets, já chaveados. Não publica
+        nada: quem chama troca o futuro e `atualizado_em` juntos, sob o
+        lock.
+        """
+        inicio = time.perf_counter()
+        ws = self.planilha.worksheet(self.abas[nome])
+        _local.leitura = 0.0
+        df = PREPARADORES[nome](ws)
+        total = time.perf_counter() - inicio
+        _tempos_carga[nome] = {
+            "leitura": _local.leitura,
+            "normalizacao": total - _local.leitura,
+        }
+        baixado_em = pd.Timestamp.now()
+
+        try:
+            salvar_snapshot(nome, self._origem(nome), df)
+        except Exception:
+            log.warning("Falha ao salvar snapshot de %s", nome, exc_info=True)
+
+        # ids valem só neste processo: ficam fora do snapshot
+        return self.unidades.chavear(nome, df), baixado_em
+
+    def _recarregar(self, nome):
+        # tarefa do futuro já definido: a data entra junto com o resultado
+        df, baixado_em = self._baixar(nome)
+        with self._lock:
+            self.atualizado_em[nome] = baixado_em
+        return df
+
+    def _atualizar(self, nome):
+        try:
+            df, baixado_em = self._baixar(nome)
+        except Exception:
+            # mantém a versão anterior; nova tentativa no próximo acesso
+            log.warning("Falha ao atualizar %s do Sheets", nome, exc_info=True)
+            with self._lock:
+                self._atualizando.discard(nome)
+            return
+
+        futuro = Future()
+        futuro.set_result(df)
+        with self._lock:
+            self._definir(nome, futuro)
+            self.atualizado_em[nome] = baixado_em
+            self._atualizando.discard(nome)
+
+    def _agendar_atualizacao(self, nome):
+        # chamado com self._lock adquirido
+        if nome in self._atualizando:
+            self.contadores["atualizacoes_coalescidas"] += 1
+            return
+
+        self.contadores["atualizacoes"] += 1
+        self._atualizando.add(nome)
+        _executor.submit(self._atualizar, nome)
+
+    def _vencida(self, nome):
+        futuro = self._futuros[nome]
+        atualizado_em = self.atualizado_em.get(nome)
+        return (
+            futuro.done() and
+            atualizado_em is not None and
+            pd.Timestamp.now() - atualizado_em >
+            pd.Timedelta(seconds=TTL_SEGUNDOS)
+        )
+
+    def atualizando(self):
+        with self._lock:
+            return bool(self._atualizando)
+
+    def estatisticas(self):
+        with self._lock:
+            return dict(self.contadores)
+
+    def _preparar(self, nome):
+        try:
+            snapshot = ler_snapshot(nome, self._origem(nome))
+        except Exception:
+            log.warning("Snapshot de %s ilegível", nome, exc_info=True)
+            snapshot = None
+
+        if snapshot is None:
+            return self._recarregar(nome)
+
+        df, salvo_em = snapshot
+        df = self.unidades.chavear(nome, df)
+        with self._lock:
+            self.atualizado_em[nome] = salvo_em
+            self._agendar_atualizacao(nome)
+        return df
+
+    def tabelas(self, nomes, com_versao=False):
+        # dispara de uma vez todas as abas que ainda não estão em memória
+        # origem de cada aba nesta chamada (ver origem_tabelas)
+        origens = {}
+        with self._lock:
+            pendentes = []
+            for nome in nomes:
+                if nome not in self._futuros:
+                    self.contadores["cargas"] += 1
+                    origens[nome] = "miss: carga"
+                    self._definir(
+                        nome, _executor.submit(self._preparar, nome))
+                elif not self._futuros[nome].done():
+                    self.contadores["coalescidas"] += 1
+                    origens[nome] = "miss: aguardou carga em andamento"
+                elif self._vencida(nome):
+                    if ATUALIZA_EM_SEGUNDO_PLANO:
+                        self.contadores["em_memoria"] += 1
+                        origens[nome] = "hit: vencida, atualizando"
+                        self._agendar_atualizacao(nome)
+                    else:
+                        self.contadores["cargas"] += 1
+                        origens[nome] = "miss: vencida, recarga"
+                        self._definir(
+                            nome, _executor.submit(self._recarregar, nome))
+                else:
+                    self.contadores["em_memoria"] += 1
+                    origens[nome] = "hit: memória"
+                pendentes.append((nome, self._futuros[nome]))
+
+            versao = tuple(self._versoes[nome] for nome in nomes)
+
+        # vale o primeiro acesso: os seguintes (derivado) só leem memória
+        acumuladas = getattr(_local, "origens", {})
+        for nome, origem in origens.items():
+            acumuladas.setdefault(nome, origem)
+        _local.origens = acumuladas
+
+        resultado = []
+        for nome, futuro in pendentes:
+            try:
+                resultado.append(futuro.result())
+            except Exception:
+                # falhou: libera a aba para a próxima tentativa
+                with self._lock:
+                    if self._futuros.get(nome) is futuro:
+                        del self._futuros[nome]
+                raise
+
+        if com_versao:
+            return tuple(resultado), versao
+        return tuple(resultado)
+
+    def derivado(self, chave, nomes, funcao, com_versao=False):
+        tabelas, versao = self.tabelas(nomes, com_versao=True)
+
+        # um futuro por (chave, versão): só uma sessão calcula, as demais
+        # esperam o mesmo resultado (como as cargas em `tabelas`)
+        with self._lock:
+            guardado = self._derivados.get(chave)
+            if guardado is not None and guardado[0] == versao:
+                futuro, calcular = guardado[1], False
+                if not futuro.done():
+                    self.contadores["derivados_coalescidos"] += 1
+            else:
+                futuro, calcular = Future(), True
+                self._derivados[chave] = (versao, futuro)
+
+        if calcular:
+            try:
+                futuro.set_result(funcao(*tabelas))
+            except Exception as erro:
+                # falhou: quem esperava recebe o erro; a próxima chamada
+                # tenta de novo
+                futuro.set_exception(erro)
+                with self._lock:
+                    if self._derivados.get(chave, (None, None))[1] is futuro:
+                        del self._derivados[chave]
+                raise
+
+        valor = futuro.result()
+
+        if com_versao:
+            return valor, versao
+        return valor
+
+
+def abrir_planilha():
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    scopes = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+    creds = Credentials.from_service_account_info(
+        st.secrets["gcp_service_account"],
+        scopes=scopes
+    )
+
+    gc = gspread.authorize(creds)
+    return gc.open_by_key(st.secrets["google_sheets"]["spreadsheet_id"])
+
+
+@st.cache_resource
+def base_atual():
+    return BaseDados(
+        abrir_planilha(),
+        st.secrets["google_sheets"]["sheet_name"]
+    )
+
+
+def load_data(*tabelas):
+    """
+    Retorna as tabelas pedidas (RESERVAS, HISTORICO, METAS), na ordem.
+
+    Os DataFrames são compartilhados entre sessões: não altere in-place.
+    """
+    return base_atual().tabelas(tabelas)
+
+
+def load_data_versionado(*tabelas):
+    """
+    Como `load_data`, mas retorna também a versão das tabelas (tupla),
+    para compor chaves de cache que mudam a cada recarga.
+    """
+    return base_atual().tabelas(tabelas, com_versao=True)
+
+
+def derivado(chave, tabelas, funcao, com_versao=False):
+    """
+    `funcao(*dfs)` sobre as tabelas pedidas, calculada uma vez por versão
+    dos dados e compartilhada entre sessões. O resultado deve conter tudo
+    de que a página precisa (não misture com DataFrames de outra versão).
+
+    Com `com_versao`, retorna (valor, versão) para compor chaves de cache.
+    """
+    return base_atual().derivado(chave, tabelas, funcao, com_versao)
+
+
+def dimensao_unidades():
+    """Dimensão (propriedade, unidade) -> id_unidade do processo."""
+    return base_atual().unidades
+
+
+def divergencias_unidades():
+    """Pares (propriedade, unidade) escritos de formas diferentes nas abas."""
+    return base_atual().unidades.divergencias()
+
+
+def reiniciar_origem_tabelas():
+    _local.origens = {}
+
+
+def origem_tabelas():
+    """
+    Como cada tabela foi servida no primeiro load_data desta sessão
+    desde reiniciar_origem_tabelas (hit em memória ou miss com carga).
+    """
+    return dict(getattr(_local, "origens", {}))
+
+
+def estatisticas_carga():
+    """Contadores de carga do processo (ver BaseDados.contadores)."""
+    return base_atual().estatisticas()
+
+
+def atualizado_em(*tabelas):
+    """Data dos dados mais antigos entre as tabelas pedidas."""
+    base = base_atual()
+    datas = [
+        base.atualizado_em[nome] for nome in tabelas
+        if nome in base.atualizado_em
+    ]
+    return min(datas) if datas else None
+
+
+def legenda_atualizacao(*tabelas):
+    data = atualizado_em(*tabelas)
+    if data is None:
+        return ""
+
+    texto = f"🕒 Dados de {data:%d/%m/%Y %H:%M}"
+    if base_atual().atualizando():
+        texto += " — atualizando em segundo plano"
+    return texto
@@ -0,0 +1,46 @@
+import plotly.io as pio
+import streamlit as st
+
+from cache_lru import CacheLRU
+from medicao import etapa
+
+# ======================
+# CACHE DE FIGURAS PLOTLY
+# ======================
+# Figuras prontas (px / go já validados) guardadas por
+# (id do gráfico, filtros, versão dos dados) e compartilhadas entre
+# sessões. Um rerun que não mexe nos filtros de um gráfico reaproveita a
+# figura em vez de remontá-la; st.plotly_chart só converte para JSON.
+
+LIMITE_BYTES_FIGURAS = 32 * 1024 * 1024
+
+
+def tamanho_figura(fig):
+    # tamanho do JSON enviado ao navegador (medido uma vez, na montagem)
+    return len(pio.to_json(fig, validate=False))
+
+
+@st.cache_resource
+def cache_figuras():
+    return CacheLRU(LIMITE_BYTES_FIGURAS, medir=tamanho_figura)
+
+
+def figura(id_grafico, filtros, versao, montar):
+    """
+    Figura `id_grafico` para os `filtros` (tupla hashable) e a `versao`
+    dos dados; `montar()` só roda na falta. A figura é compartilhada:
+    não altere o objeto retornado.
+    """
+    if isinstance(id_grafico, tuple):
+        nome = " · ".join(map(str, id_grafico))
+    else:
+        nome = id_grafico
+
+    # "montar" aninhado sob "gráfico" só aparece quando o cache falha
+    def montar_medido():
+        with etapa(f"montar {nome}"):
+            return montar()
+
+    with etapa(f"gráfico {nome}"):
+        return cache_figuras().obter(
+            (id_grafico, filtros, versao), montar_medido)
@@ -0,0 +1,520 @@
+import numpy as np
+import pandas as pd
+
+from dados import HISTORICO, METAS, RESERVAS, derivado
+from niveis import classificar_niveis
+
+# ======================
+# ÍNDICES DERIVADOS DA BASE PREPARADA
+# ======================
+# Estruturas montadas uma vez por versão dos dados (ver dados.derivado)
+# e compartilhadas entre sessões. Tudo aqui é somente leitura.
+
+
+# ======================
+# PARTIÇÃO MENSAL
+# ======================
+
+
+class ParticaoMensal:
+    """
+    Tabela ordenada por `mes_dt` com a fatia contígua de cada mês.
+
+    Filtrar um mês lê só as linhas daquele mês (iloc sobre um intervalo)
+    em vez de varrer a tabela inteira com uma máscara booleana.
+    """
+
+    def __init__(self, df, coluna="mes_dt"):
+        ordinais = df[coluna].array.asi8
+        ordem = np.argsort(ordinais, kind="stable")
+
+        self.tabela = df.take(ordem).reset_index(drop=True)
+        self.vazia = self.tabela.iloc[0:0]
+
+        ordinais = ordinais[ordem]
+        unicos, inicios = np.unique(ordinais, return_index=True)
+        fins = np.append(inicios[1:], len(ordinais))
+
+        nat = np.iinfo(np.int64).min
+        self.fatias = {
+            pd.Period(ordinal=int(o), freq="M"): slice(int(i), int(f))
+            for o, i, f in zip(unicos, inicios, fins)
+            if o != nat
+        }
+        self.periodos = sorted(self.fatias)
+
+    def mes(self, periodo):
+        fatia = self.fatias.get(pd.Period(periodo, freq="M"))
+        if fatia is None:
+            return self.vazia
+        return self.tabela.iloc[fatia]
+
+    def intervalo(self, inicio, fim):
+        """Linhas de `inicio` a `fim` (inclusive), ainda contíguas."""
+        inicio = pd.Period(inicio, freq="M")
+        fim = pd.Period(fim, freq="M")
+        dentro = [p for p in self.periodos if inicio <= p <= fim]
+        if not dentro:
+            return self.vazia
+        return self.tabela.iloc[
+            self.fatias[dentro[0]].start:self.fatias[dentro[-1]].stop
+        ]
+
+
+# ======================
+# CUBO DE RESERVAS
+# ======================
+
+DIMENSOES_CUBO = [
+    "mes", "mes_dt", "partner",
+    "id_propriedade", "propriedade", "unidade", "id_unidade", "canal"
+]
+
+
+def montar_cubo(df):
+    """
+    Reservas agregadas no grão mês × partner × prédio × unidade × canal,
+    particionadas por mês.
+
+    As medidas mantêm os nomes das colunas originais (noites_mes,
+    valor_mes, limpeza_mes), então somas sobre o cubo dão o mesmo que
+    sobre as reservas. `reservas` é a contagem distinta de id_reserva na
+    célula; dentro de um mês cada reserva cai numa única célula, então
+    também pode ser somada.
+    """
+    cubo = (
+        df.groupby(DIMENSOES_CUBO, observed=True, sort=False)
+        .agg(
+            noites_mes=("noites_mes", "sum"),
+            valor_mes=("valor_mes", "sum"),
+            limpeza_mes=("limpeza_mes", "sum"),
+            reservas=("id_reserva", "nunique")
+        )
+        .reset_index()
+    )
+    return ParticaoMensal(cubo)
+
+
+def cubo_reservas(com_versao=False):
+    return derivado(
+        ("cubo", RESERVAS), [RESERVAS], montar_cubo, com_versao
+    )
+
+
+# ======================
+# HIERARQUIA DOS FILTROS (SIDEBAR)
+# ======================
+
+
+class HierarquiaFiltros:
+    """
+    Listas de opções da sidebar (partner → prédio → unidade, meses e
+    canais), já ordenadas, montadas uma vez por versão das reservas.
+    """
+
+    def __init__(self, df):
+        self.partners = sorted(df["partner"].dropna().unique().tolist())
+
+        self.meses = (
+            df[["mes", "mes_dt"]]
+            .drop_duplicates()
+            .sort_values("mes_dt")["mes"]
+            .tolist()
+        )
+
+        self.predios = sorted(df["propriedade"].unique().tolist())
+
+        pares = df[["partner", "propriedade"]].drop_duplicates()
+        self.predios_por_partner = {
+            partner: sorted(grupo["propriedade"].tolist())
+            for partner, grupo in pares.groupby("partner", observed=True)
+        }
+
+        pares = df[["propriedade", "unidade"]].drop_duplicates()
+        self.unidades_por_predio = {
+            predio: sorted(grupo["unidade"].tolist())
+            for predio, grupo in pares.groupby("propriedade", observed=True)
+        }
+
+        self.canais = sorted(df["canal"].unique().tolist())
+
+    def predios_do_partner(self, partner):
+        if partner == "Todos":
+            return self.predios
+        return self.predios_por_partner.get(partner, [])
+
+    def unidades_do_predio(self, predio):
+        return self.unidades_por_predio.get(predio, [])
+
+
+def hierarquia_filtros():
+    return derivado(
+        ("hierarquia", RESERVAS), [RESERVAS], HierarquiaFiltros
+    )
+
+
+# ======================
+# METAS POR UNIDADE ("BASE NÍVEIS")
+# ======================
+
+
+class IndiceMetas:
+    """
+    Metas da aba "Base Níveis" por id_unidade, com receita_esperada
+    numérica (NaN quando inválida). Chave repetida na aba: vale a
+    primeira linha.
+
+    `meta(id_unidade)` e `anexar(df)` indexam um array pelo id_unidade,
+    sem dicionário nem merge de strings.
+    """
+
+    def __init__(self, df_meta):
+        metas = df_meta.drop_duplicates("id_unidade")
+
+        ids = metas["id_unidade"].to_numpy()
+        valores = pd.to_numeric(
+            metas["receita_esperada"], errors="coerce"
+        ).to_numpy(dtype=float)
+
+        # posição = id_unidade; o NaN extra no fim cobre ids sem meta
+        self.por_id = np.full(ids.max() + 2 if len(ids) else 1, np.nan)
+        self.por_id[ids] = valores
+
+        # distingue "fora da aba" de "meta inválida" (ambos NaN acima)
+        self.na_aba = np.zeros(len(self.por_id), dtype=bool)
+        self.na_aba[ids] = True
+
+    def meta(self, id_unidade):
+        """
+        Meta da unidade (NaN se inválida); None se ela não está na aba.
+        """
+        if id_unidade is None:
+            return None
+
+        posicao = min(id_unidade, len(self.por_id) - 1)
+        if not self.na_aba[posicao]:
+            return None
+        return self.por_id[posicao]
+
+    def anexar(self, df):
+        """Cópia de `df` com a coluna receita_esperada (NaN sem meta)."""
+        ids = df["id_unidade"].to_numpy()
+        sem_meta = len(self.por_id) - 1
+
+        df = df.copy()
+        df["receita_esperada"] = self.por_id[np.minimum(ids, sem_meta)]
+        return df
+
+
+def indice_metas():
+    return derivado(("indice_metas", METAS), [METAS], IndiceMetas)
+
+
+# ======================
+# PAINÉIS MENSAIS (UNIDADE / PRÉDIO)
+# ======================
+
+
+class PainelMensal:
+    """
+    Fechamento mensal por chave (unidade ou prédio), com as métricas já
+    derivadas: noites, receitas, unidades, ocupação, ADR e RevPAR.
+
+    `obter(chave)` devolve as linhas da chave, ordenadas por mês, sem
+    varrer nem reagrupar a base.
+    """
+
+    def __init__(self, cubo, chaves, contar_unidades):
+        medidas = {
+            "noites_ocupadas": ("noites_mes", "sum"),
+            "receita_total": ("valor_mes", "sum"),
+            "receita_limpeza": ("limpeza_mes", "sum"),
+        }
+        if contar_unidades:
+            medidas["unidades"] = ("id_unidade", "nunique")
+
+        painel = (
+            cubo.groupby(chaves + ["mes", "mes_dt"], observed=True)
+            .agg(**medidas)
+            .reset_index()
+            .sort_values(chaves + ["mes_dt"], kind="stable")
+            .reset_index(drop=True)
+        )
+
+        if not contar_unidades:
+            painel["unidades"] = 1
+
+        painel["mes_fmt"] = painel["mes_dt"].dt.strftime("%m-%Y")
+        painel["receita_diarias"] = (
+            painel["receita_total"] - painel["receita_limpeza"]
+        )
+        painel["dias_mes"] = painel["mes_dt"].dt.days_in_month
+        painel["ocupacao"] = (
+            painel["noites_ocupadas"] /
+            (painel["dias_mes"] * painel["unidades"]) * 100
+        )
+        painel["ADR"] = (
+            painel["receita_diarias"] /
+            painel["noites_ocupadas"].replace(0, pd.NA)
+        )
+        painel["RevPAR"] = painel["ADR"] * (painel["ocupacao"] / 100)
+
+        self.tabela = painel
+        self.vazia = painel.iloc[0:0]
+
+        agrupador = chaves if len(chaves) > 1 else chaves[0]
+        self.posicoes = painel.groupby(agrupador, observed=True).indices
+
+    def obter(self, chave):
+        posicoes = self.posicoes.get(chave)
+        if posicoes is None:
+            return self.vazia
+        return self.tabela.iloc[posicoes]
+
+
+def painel_unidades():
+    """Painel por id_unidade (ver dados.DimensaoUnidades)."""
+    return derivado(
+        ("painel", "unidade"), [RESERVAS],
+        lambda df: PainelMensal(
+            cubo_reservas().tabela, ["id_unidade"], False
+        )
+    )
+
+
+def painel_predios():
+    """Painel por propriedade (com nº de unidades no mês)."""
+    return derivado(
+        ("painel", "predio"), [RESERVAS],
+        lambda df: PainelMensal(
+            cubo_reservas().tabela, ["propriedade"], True
+        )
+    )
+
+
+# ======================
+# KPIs MENSAIS (DASH REVENUE)
+# ======================
+
+
+def montar_kpis_mensais(cubo, historico, partner):
+    """
+    Uma linha por mês (índice `mes_dt`) com os KPIs do Dash Revenue para
+    o partner: receita, noites, unidades, ocupação, tarifa média (do cubo
+    de reservas) e cleaning / adm (do histórico), num único groupby cada.
+
+    Meses sem reservas ficam com receita NaN; sem histórico, cleaning e
+    adm NaN.
+    """
+    res = cubo.tabela
+    if partner != "Todos":
+        res = res[res["partner"] == partner]
+
+    kpis = res.groupby("mes_dt").agg(
+        receita=("valor_mes", "sum"),
+        noites=("noites_mes", "sum")
+    )
+    kpis["unidades"] = res.groupby("mes_dt")["id_unidade"].nunique()
+
+    dias_mes = kpis.index.days_in_month
+    kpis["ocupacao"] = (
+        kpis["noites"] / (kpis["unidades"] * dias_mes) * 100
+    ).where(kpis["unidades"] > 0, 0.0)
+    kpis["tarifa_media"] = (
+        kpis["receita"] / kpis["noites"].where(kpis["noites"] > 0)
+    ).fillna(0.0)
+
+    hist = historico[historico["partnership"].notna()]
+    if partner != "Todos":
+        hist = hist[hist["partnership"] == partner]
+
+    kpis_hist = hist.groupby("mes_dt").agg(
+        cleaning=("cleaning_revenue", "sum"),
+        adm=("adm_360", "sum")
+    )
+
+    return kpis.join(kpis_hist, how="outer").sort_index()
+
+
+def kpis_mensais(partner):
+    """KPIs por mês do partner ("Todos" = carteira inteira)."""
+    return derivado(
+        ("kpis_mensais", partner), [RESERVAS, HISTORICO],
+        lambda df_res, df_hist: montar_kpis_mensais(
+            cubo_reservas(), df_hist, partner
+        )
+    )
+
+
+# ======================
+# NÍVEIS POR MÊS E UNIDADE (DASH REVENUE)
+# ======================
+
+
+def montar_base_niveis(historico, metas, partner):
+    """
+    Todos os meses do histórico do partner numa única passada (um
+    groupby e uma busca no índice de metas), por mês e unidade:
+    - mes_dt
+    - id_unidade
+    - realizado_plclcadm
+    - receita_esperada
+    - atingimento (NaN sem meta válida)
+    - nivel_num (1 a 5) / nivel (texto)
+    """
+    hist = historico[historico["partnership"].notna()]
+    if partner != "Todos":
+        hist = hist[hist["partnership"] == partner]
+
+    # --- soma PLCLCADM por mês e unidade (chave inteira) ---
+    base = (
+        hist
+        .groupby(["mes_dt", "id_unidade"], as_index=False)
+        .agg(realizado_plclcadm=("plclcadm", "sum"))
+    )
+    base["mes_dt"] = base["mes_dt"].astype("period[M]")
+
+    # --- meta de cada unidade (índice de metas, já numérico) ---
+    base = metas.anexar(base)
+
+    base["atingimento"] = (
+        base["realizado_plclcadm"] /
+        base["receita_esperada"].where(base["receita_esperada"] > 0)
+    )
+
+    # --- classifica nível (vetorizado, niveis.py) ---
+    base["nivel_num"], base["nivel"] = classificar_niveis(
+        base["atingimento"]
+    )
+
+    return base
+
+
+class BaseNiveis(ParticaoMensal):
+    """
+    Base de níveis de todos os meses do partner, particionada por mês:
+    atual, M-1 e YoY só fatiam (`mes`). A janela de evolução lê os
+    agregados por mês (`por_mes`), montados junto com a base.
+    """
+
+    def __init__(self, historico, metas, partner):
+        super().__init__(montar_base_niveis(historico, metas, partner))
+
+        # somas e contagens (sem NaN) por mês
+        self.por_mes = self.tabela.groupby("mes_dt").agg(
+            soma_atingimento=("atingimento", "sum"),
+            qtd_atingimento=("atingimento", "count"),
+            soma_nivel=("nivel_num", "sum"),
+            qtd_nivel=("nivel_num", "count"),
+        )
+
+    def medias(self, periodos):
+        """
+        Atingimento e nível médios de cada período (índice = `periodos`);
+        mês sem unidade com meta = 0.
+        """
+        mes = self.por_mes.reindex(periodos)
+        qtd_atingimento = mes["qtd_atingimento"]
+        qtd_nivel = mes["qtd_nivel"]
+        return pd.DataFrame({
+            "atingimento": (
+                mes["soma_atingimento"] /
+                qtd_atingimento.where(qtd_atingimento > 0)
+            ),
+            "nivel_num": mes["soma_nivel"] / qtd_nivel.where(qtd_nivel > 0),
+        }).fillna(0)
+
+
+def base_niveis(partner):
+    """Base de níveis do partner ("Todos" = carteira inteira)."""
+    return derivado(
+        ("base_niveis", partner), [HISTORICO, METAS],
+        lambda df_hist, df_meta: BaseNiveis(
+            df_hist, indice_metas(), partner
+        )
+    )
+
+
+# ======================
+# ACUMULADOS MENSAIS (JANELAS / YTD)
+# ======================
+
+
+class AcumuladoMensal:
+    """
+    Somas acumuladas mês a mês das medidas aditivas da tabela de KPIs
+    (meses sem dados contam zero). O total de qualquer intervalo é a
+    diferença de duas linhas, então janelas de 3 ou 24 meses, somas
+    móveis e YTD custam o mesmo.
+
+    `capacidade` é unidades × dias do mês (noites disponíveis), para
+    recompor a ocupação do intervalo.
+    """
+
+    MEDIDAS = ["receita", "noites", "capacidade", "cleaning", "adm"]
+
+    def __init__(self, kpis):
+        self.inicio = kpis.index.min() if not kpis.empty else None
+
+        if self.inicio is None:
+            self.meses = pd.PeriodIndex([], freq="M")
+            self.acumulado = np.zeros((1, len(self.MEDIDAS)))
+            return
+
+        self.meses = pd.period_range(
+            self.inicio, kpis.index.max(), freq="M"
+        )
+        base = kpis.reindex(self.meses)
+        base["capacidade"] = base["unidades"] * self.meses.days_in_month
+
+        valores = base[self.MEDIDAS].fillna(0).to_numpy(dtype=float)
+        # linha 0 = antes do primeiro mês; linha k = soma dos k primeiros
+        self.acumulado = np.vstack([
+            np.zeros((1, len(self.MEDIDAS))),
+            np.cumsum(valores, axis=0)
+        ])
+
+    def _linha(self, periodo):
+        # nº de meses da série até `periodo` (inclusive), limitado à série
+        if self.inicio is None:
+            return 0
+        deslocamento = periodo.ordinal - self.inicio.ordinal + 1
+        return min(max(deslocamento, 0), len(self.meses))
+
+    def soma(self, inicio, fim):
+        """Totais de `inicio` a `fim` (inclusive), em tempo constante."""
+        inicio = pd.Period(inicio, freq="M")
+        fim = pd.Period(fim, freq="M")
+        somas = (
+            self.acumulado[self._linha(fim)] -
+            self.acumulado[self._linha(inicio - 1)]
+        )
+        return _indicadores(dict(zip(self.MEDIDAS, somas)))
+
+    def janela(self, fim, meses):
+        """Os `meses` meses terminando em `fim`."""
+        fim = pd.Period(fim, freq="M")
+        return self.soma(fim - (meses - 1), fim)
+
+    def ytd(self, fim):
+        """De janeiro até `fim`, no ano de `fim`."""
+        fim = pd.Period(fim, freq="M")
+        return self.soma(pd.Period(year=fim.year, month=1, freq="M"), fim)
+
+
+def _indicadores(somas):
+    """Ocupação e tarifa média recompostas a partir das somas."""
+    noites = somas["noites"]
+    capacidade = somas["capacidade"]
+
+    somas["ocupacao"] = noites / capacidade * 100 if capacidade > 0 else 0.0
+    somas["tarifa_media"] = somas["receita"] / noites if noites > 0 else 0.0
+    return somas
+
+
+def acumulado_mensal(partner):
+    """Acumulados mensais sobre kpis_mensais(partner)."""
+    return derivado(
+        ("acumulado_mensal", partner), [RESERVAS, HISTORICO],
+        lambda df_res, df_hist: AcumuladoMensal(kpis_mensais(partner))
+    )
@@ -0,0 +1,167 @@
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from dados import (
+    avisos_parse, estatisticas_carga, memoria_tabelas, origem_tabelas,
+    reiniciar_origem_tabelas, tempos_carga
+)
+
+# ======================
+# TEMPOS POR ETAPA (MODO DEBUG)
+# ======================
+# Cada página abre uma execução no topo (iniciar_execucao) e marca as
+# etapas com `with etapa("nome"):`. Com ?debug=1 na URL (ou
+# debug_tempos = true nos secrets), painel_tempos() mostra no fim da
+# página a quebra do rerun: tabela, cascata e origem das tabelas.
+# Fora do modo debug, etapa() não registra nada.
+
+CHAVE_SESSAO = "_execucao_tempos"
+
+
+def modo_debug():
+    if st.query_params.get("debug") == "1":
+        return True
+    return bool(st.secrets.get("debug_tempos", False))
+
+
+def iniciar_execucao():
+    """Abre a medição do rerun (chamar no topo da página)."""
+    reiniciar_origem_tabelas()
+    st.session_state[CHAVE_SESSAO] = {
+        "ativo": modo_debug(),
+        "inicio": time.perf_counter(),
+        "nivel": 0,
+        "etapas": [],
+    }
+
+
+@contextmanager
+def etapa(nome):
+    """Registra início e duração do bloco; etapas podem ser aninhadas."""
+    execucao = st.session_state.get(CHAVE_SESSAO)
+    if not execucao or not execucao["ativo"]:
+        yield
+        return
+
+    registro = {
+        "etapa": nome,
+        "nivel": execucao["nivel"],
+        "inicio": time.perf_counter() - execucao["inicio"],
+        "duracao": None,
+    }
+    execucao["etapas"].append(registro)
+    execucao["nivel"] += 1
+    try:
+        yield
+    finally:
+        execucao["nivel"] -= 1
+        registro["duracao"] = (
+            time.perf_counter() - execucao["inicio"] - registro["inicio"]
+        )
+
+
+def _tabela_etapas(execucao, total):
+    df = pd.DataFrame(execucao["etapas"])
+    if df.empty:
+        return df
+
+    df["etapa"] = [
+        "   " * nivel + nome for nivel, nome in zip(df["nivel"], df["etapa"])
+    ]
+    df["inicio_ms"] = df["inicio"] * 1000
+    df["duracao_ms"] = df["duracao"].fillna(0) * 1000
+    df["pct_rerun"] = df["duracao"].fillna(0) / total * 100
+    return df[["etapa", "inicio_ms", "duracao_ms", "pct_rerun"]]
+
+
+def _cascata(tabela):
+    fig = go.Figure(go.Bar(
+        y=tabela["etapa"],
+        x=tabela["duracao_ms"],
+        base=tabela["inicio_ms"],
+        orientation="h",
+        hovertemplate="%{y}<br>início %{base:.1f} ms"
+                      "<br>duração %{x:.1f} ms<extra></extra>"
+    ))
+    fig.update_layout(
+        title="Cascata do rerun",
+        xaxis_title="ms desde o início do rerun",
+        yaxis=dict(autorange="reversed"),
+        height=max(300, 24 * len(tabela) + 120)
+    )
+    return fig
+
+
+def painel_tempos(caches=None):
+    """
+    Quebra de tempos do rerun atual (só no modo debug). `caches`:
+    nome -> CacheLRU cujas estatísticas entram no painel.
+    """
+    execucao = st.session_state.get(CHAVE_SESSAO)
+    if not execucao or not execucao["ativo"]:
+        return
+
+    total = time.perf_counter() - execucao["inicio"]
+
+    with st.expander(f"⏱️ Tempos do rerun — {total * 1000:.0f} ms"):
+        tabela = _tabela_etapas(execucao, total)
+        if tabela.empty:
+            st.caption("Nenhuma etapa registrada.")
+        else:
+            st.dataframe(
+                tabela.style.format({
+                    "inicio_ms": "{:.1f}",
+                    "duracao_ms": "{:.1f}",
+                    "pct_rerun": "{:.1f}%"
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+            st.plotly_chart(_cascata(tabela), use_container_width=True)
+        st.caption(
+            "Etapas de fragmentos rerodados sozinhos ficam fora; "
+            "recarregue a página para medi-los."
+        )
+
+        st.markdown("**Cache do load_data (neste rerun)**")
+        origens = pd.DataFrame(
+            [{"tabela": nome, "origem": origem}
+             for nome, origem in origem_tabelas().items()]
+        )
+        tempos = tempos_carga()
+        if not origens.empty:
+            origens["leitura_s"] = origens["tabela"].map(
+                lambda nome: tempos.get(nome, {}).get("leitura"))
+            origens["normalizacao_s"] = origens["tabela"].map(
+                lambda nome: tempos.get(nome, {}).get("normalizacao"))
+        st.dataframe(origens, use_container_width=True, hide_index=True)
+        st.caption(
+            "leitura/normalização: última carga de cada aba no processo. "
+            f"Contadores: {estatisticas_carga()}"
+        )
+
+        memoria = memoria_tabelas()
+        if memoria:
+            st.caption(" · ".join(
+                f"{nome}: {antes / 1e6:.1f} → {depois / 1e6:.1f} MB"
+                for nome, (antes, depois) in memoria.items()
+            ))
+
+        if caches:
+            st.markdown("**Caches LRU do processo**")
+            st.dataframe(
+                pd.DataFrame({
+                    nome: cache.estatisticas()
+                    for nome, cache in caches.items()
+                }).T,
+                use_container_width=True
+            )
+
+        for coluna, (qtd, exemplos) in avisos_parse().items():
+            st.caption(
+                f"parse_brl — {coluna}: {qtd} célula(s), ex.: {exemplos}"
+            )
@@ -0,0 +1,34 @@
+import numpy as np
+
+# ======================
+# CLASSIFICAÇÃO DE NÍVEL (COMPARTILHADA)
+# ======================
+# atingimento = realizado / meta. Cada limite é o início do nível
+# seguinte: < 0.5 → Nível 1, [0.5, 0.85) → 2, [0.85, 1) → 3,
+# [1, 1.15) → 4, >= 1.15 → 5.
+
+LIMITES_NIVEIS = np.array([0.5, 0.85, 1.0, 1.15])
+
+ROTULOS_NIVEIS = ["Nível 1", "Nível 2", "Nível 3", "Nível 4", "Nível 5"]
+SEM_META = "Sem Meta"
+
+_ROTULOS = np.array(ROTULOS_NIVEIS + [SEM_META], dtype=object)
+
+
+def classificar_niveis(atingimento):
+    """
+    Classifica um vetor de atingimentos de uma vez (busca binária nos
+    limites). Retorna (nivel_num, nivel): números 1–5 (float, NaN sem
+    meta) e rótulos "Nível N" / "Sem Meta".
+    """
+    valores = np.asarray(atingimento, dtype=float)
+    sem_meta = np.isnan(valores)
+
+    indice = np.searchsorted(LIMITES_NIVEIS, valores, side="right")
+
+    nivel_num = (indice + 1).astype(float)
+    nivel_num[sem_meta] = np.nan
+
+    nivel = _ROTULOS[np.where(sem_meta, len(ROTULOS_NIVEIS), indice)]
+
+    return nivel_num, nivel
@@ -3,6 +3,17 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 
+from dados import (
+    HISTORICO, METAS, RESERVAS, avisos_parse, divergencias_unidades,
+    legenda_atualizacao, load_data_versionado
+)
+from figuras import cache_figuras, figura
+from indices import (
+    acumulado_mensal, base_niveis, cubo_reservas, hierarquia_filtros,
+    kpis_mensais
+)
+from medicao import etapa, iniciar_execucao, painel_tempos
+
 
 def formatar_valor_exec(valor):
     if valor is None or pd.isna(valor):
@@ -25,6 +36,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# tempos por etapa deste rerun (painel no fim da página com ?debug=1)
+iniciar_execucao()
+
 # ======================
 # HEADER PADRÃO — DASH REVENUE
 # ======================
@@ -87,157 +101,26 @@ CORES_NIVEIS = {
 
 COR_SHARE = "#38bdf8"  # azul claro executivo
 
-MAPA_NIVEL_NUM = {
-    "Nível 1": 1,
-    "Nível 2": 2,
-    "Nível 3": 3,
-    "Nível 4": 4,
-    "Nível 5": 5
-}
+JANELAS_EVOLUCAO = [3, 6, 12, 24]  # meses
 
 # ======================
-# FUNÇÕES DE CARGA
+# CARGA (já normalizada em dados.py)
 # ======================
 
-
-@st.cache_data(ttl=3600)
-def load_data():
-    import gspread
-    from google.oauth2.service_account import Credentials
-
-    scopes = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
-    creds = Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"],
-        scopes=scopes
-    )
-
-    gc = gspread.authorize(creds)
-    sh = gc.open_by_key(st.secrets["google_sheets"]["spreadsheet_id"])
-
-    # ---- Aba principal de reservas ----
-    ws_res = sh.worksheet(st.secrets["google_sheets"]["sheet_name"])
-    df_res = pd.DataFrame(ws_res.get_all_records())
-    df_res.columns = df_res.columns.str.strip()
-    df_res["mes_dt"] = pd.to_datetime(
-        df_res["mes"].astype(str),
-        errors="coerce"
-    ).dt.to_period("M")
-
-    # ---- Aba Histórico Unidades ----
-    ws_hist = sh.worksheet("Histórico Unidades")
-    values_hist = ws_hist.get_all_values()
-
-    df_hist = pd.DataFrame(
-        values_hist[1:],
-        columns=values_hist[0]
-    )
-
-    df_hist.columns = df_hist.columns.str.strip().str.lower()
-
-    # ---- Aba Base Níveis ----
-    ws_meta = sh.worksheet("Base Níveis")
-    df_meta = pd.DataFrame(ws_meta.get_all_records())
-    df_meta.columns = df_meta.columns.str.strip().str.lower()
-
-    return df_res, df_hist, df_meta
+# dispara as três abas juntas; cubo, partição e índices leem desta carga.
+# versao_dados entra na chave das figuras em cache (figuras.py)
+with etapa("load"):
+    _, versao_dados = load_data_versionado(RESERVAS, HISTORICO, METAS)
 
 
-df_res, df_hist, df_meta = load_data()
-
-# ======================
-# NORMALIZAÇÃO DE PARTNER
-# ======================
-
-df_res["partner"] = df_res["partner"].astype(str).str.strip()
-df_hist["partnership"] = df_hist["partnership"].astype(str).str.strip()
-df_hist["plclcadm"] = df_hist["plclcadm"].fillna(0)
-
-df_hist["mes_dt"] = pd.to_datetime(
-    df_hist["mês"].astype(str),
-    errors="coerce"
-).dt.to_period("M")
-
-
-# ======================
-# NORMALIZAÇÃO — FUNÇÕES
-# ======================
-
-
-def parse_brl(series):
-    return (
-        series.astype(str)
-        .str.strip()
-        .str.replace("\u00a0", "", regex=False)
-        .str.replace(".", "", regex=False)
-        .str.replace(",", ".", regex=False)
-        .str.replace(r"[^\d.-]", "", regex=True)
-        .replace("", "0")
-        .pipe(pd.to_numeric, errors="coerce")
-        .fillna(0.0)
-    )
-
-# ======================
-# NORMALIZAÇÃO — BASE NÍVEIS
-# ======================
-
-
-df_meta["receita_esperada"] = parse_brl(df_meta["receita_esperada"])
-
-
-def classificar_nivel(atingimento):
-    if atingimento >= 1.15:
-        return "Nível 5"
-    elif atingimento >= 1:
-        return "Nível 4"
-    elif atingimento >= 0.85:
-        return "Nível 3"
-    elif atingimento >= 0.5:
-        return "Nível 2"
-    else:
-        return "Nível 1"
-
-
-# ======================
-# NORMALIZAÇÃO — RESERVAS
-# ======================
-
-df_res["valor_mes"] = parse_brl(df_res["valor_mes"])
-df_res["limpeza_mes"] = parse_brl(df_res["limpeza_mes"])
-
-df_res["noites_mes"] = (
-    df_res["noites_mes"]
-    .astype(str)
-    .str.replace(",", ".")
-    .astype(float)
-    .astype(int)
-)
-
-# ======================
-# NORMALIZAÇÃO — HISTÓRICO UNIDADES
-# ======================
-
-# padroniza nomes para bater com reservas
-df_hist.columns = (
-    df_hist.columns
-    .str.strip()
-    .str.lower()
-)
-
-df_hist["cleaning_revenue"] = parse_brl(df_hist["cleaning_revenue"])
-df_hist["adm_360"] = parse_brl(df_hist["adm_360"])
-df_hist["price_less_comission"] = parse_brl(df_hist["price_less_comission"])
-df_hist["plclcadm"] = parse_brl(df_hist["plclcadm"])
-
 # ======================
 # FILTRO DE MÊS (EXECUTIVO)
 # ======================
 
-meses = (
-    df_res[["mes", "mes_dt"]]
-    .drop_duplicates()
-    .sort_values("mes_dt")["mes"]
-    .tolist()
-)
+# opções já prontas na hierarquia (sem varrer a base a cada rerun)
+with etapa("hierarquia de filtros"):
+    hierarquia = hierarquia_filtros()
+meses = hierarquia.meses
 
 # ======================
 # SIDEBAR — FILTROS
@@ -245,6 +128,15 @@ meses = (
 
 with st.sidebar:
     st.header("🔎 Filtros")
+    st.caption(legenda_atualizacao(RESERVAS, HISTORICO, METAS))
+
+    for coluna, (qtd, exemplos) in avisos_parse().items():
+        st.caption(
+            f"⚠️ {qtd} célula(s) não numérica(s) em {coluna}: {exemplos}"
+        )
+
+    for divergencia in divergencias_unidades():
+        st.caption(f"⚠️ Grafias divergentes: {divergencia}")
 
     mes_sel = st.selectbox(
         "📅 Mês de análise",
@@ -252,32 +144,43 @@ with st.sidebar:
         index=len(meses) - 1
     )
 
-    partners = ["Todos"] + sorted(
-        df_res["partner"].dropna().unique().tolist()
-    )
+    partners = ["Todos"] + hierarquia.partners
 
     partner_sel = st.selectbox(
         "🤝 Partner",
         partners
     )
 
+# ======================
+# FATIAS MENSAIS (PARTIÇÃO POR MÊS + PARTNER)
+# ======================
+
+# reservas vêm do cubo (mês × partner × prédio × unidade × canal);
+# o histórico entra já agregado (kpis_mensais, base_niveis)
+with etapa("cubo"):
+    cubo_res = cubo_reservas()
+
+
+def reservas_mes(periodo):
+    df_m = cubo_res.mes(periodo)
+    if partner_sel != "Todos":
+        df_m = df_m[df_m["partner"] == partner_sel]
+    return df_m
+
+
 # ---- aplica filtros ----
 periodo_sel = pd.Period(mes_sel, freq="M")
+filtros = (partner_sel, periodo_sel)  # chave das figuras em cache
 
-df_res_m = df_res[df_res["mes_dt"] == periodo_sel]
-
-df_hist_m = df_hist[
-    (df_hist["mes_dt"] == periodo_sel) &
-    (df_hist["partnership"].notna())
-]
+with etapa("filtro"):
+    df_res_m = reservas_mes(periodo_sel)
 
 if partner_sel != "Todos":
-    df_res_m = df_res_m[df_res_m["partner"] == partner_sel]
-    df_hist_m = df_hist_m[df_hist_m["partnership"] == partner_sel]
     st.caption(f"Resultados para o partner: **{partner_sel}**")
 
 if df_res_m.empty:
     st.warning("Sem dados de reservas para o mês selecionado.")
+    painel_tempos({"figuras": cache_figuras()})
     st.stop()
 
 # ======================
@@ -324,132 +227,41 @@ with f2:
 # ======================
 
 
-def calcular_kpis_mes(df, periodo):
-    df_m = df[df["mes_dt"] == periodo]
+# uma linha por mês, calculada uma vez por partner e versão dos dados;
+# atual, M-1, YoY e a evolução recente só leem a tabela
+with etapa("KPIs mensais"):
+    tabela_kpis = kpis_mensais(partner_sel)
 
-    if df_m.empty:
-        return None
 
-    dias_mes_tmp = periodo.days_in_month
-
-    receita = df_m["valor_mes"].sum()
-    noites = df_m["noites_mes"].sum()
-
-    unidades_tmp = (
-        df_m[["id_propriedade", "unidade"]]
-        .drop_duplicates()
-        .shape[0]
-    )
-
-    ocupacao = (
-        (noites / (unidades_tmp * dias_mes_tmp)) * 100
-        if unidades_tmp > 0 else 0
-    )
+def calcular_kpis_mes(periodo):
+    if periodo not in tabela_kpis.index:
+        return None
 
-    tarifa_media = receita / noites if noites > 0 else 0
+    linha = tabela_kpis.loc[periodo]
+    if pd.isna(linha["receita"]):
+        return None
 
     return {
-        "receita": receita,
-        "ocupacao": ocupacao,
-        "tarifa_media": tarifa_media
+        "receita": linha["receita"],
+        "ocupacao": linha["ocupacao"],
+        "tarifa_media": linha["tarifa_media"]
     }
 
 
-def calcular_kpis_hist_mes(df_hist, periodo):
-    df_m = df_hist[df_hist["mes_dt"] == periodo]
+def calcular_kpis_hist_mes(periodo):
+    if periodo not in tabela_kpis.index:
+        return {"cleaning": None, "adm": None}
 
-    if df_m.empty:
+    linha = tabela_kpis.loc[periodo]
+    if pd.isna(linha["cleaning"]):
         return {"cleaning": None, "adm": None}
 
     return {
-        "cleaning": df_m["cleaning_revenue"].sum(),
-        "adm": df_m["adm_360"].sum()
+        "cleaning": linha["cleaning"],
+        "adm": linha["adm"]
     }
 
 
-def calcular_base_niveis(df_hist, df_meta, periodo, partner_sel):
-    """
-    Retorna base por unidade com:
-    - realizado_plclcadm
-    - receita_esperada
-    - atingimento
-    - nivel (texto)
-    - nivel_num (1 a 5)
-    """
-
-    # --- normaliza período ---
-    if isinstance(periodo, pd.Period):
-        periodo_str = periodo.strftime("%Y-%m")
-    else:
-        periodo_str = str(periodo)
-
-    # --- filtra histórico ---
-    df_m = df_hist[df_hist["mes_dt"] ==
-                   pd.Period(periodo_str, freq="M")].copy()
-
-    if partner_sel != "Todos":
-        df_m = df_m[df_m["partnership"] == partner_sel]
-
-    if df_m.empty:
-        return pd.DataFrame()
-
-    # --- soma PLCLCADM por unidade ---
-    base = (
-        df_m
-        .groupby(["propriedade", "unidade"], as_index=False)
-        .agg(realizado_plclcadm=("plclcadm", "sum"))
-    )
-
-    # --- merge com metas ---
-    base = base.merge(
-        df_meta,
-        on=["propriedade", "unidade"],
-        how="left"
-    )
-
-    # --- garante numérico ---
-    base["realizado_plclcadm"] = pd.to_numeric(
-        base["realizado_plclcadm"], errors="coerce"
-    )
-
-    base["receita_esperada"] = pd.to_numeric(
-        base["receita_esperada"], errors="coerce"
-    )
-
-    # --- calcula atingimento ---
-    base["atingimento"] = None
-    mask = base["receita_esperada"] > 0
-
-    base.loc[mask, "atingimento"] = (
-        base.loc[mask, "realizado_plclcadm"] /
-        base.loc[mask, "receita_esperada"]
-    )
-
-    # --- classifica nível ---
-    base["nivel"] = "Sem Meta"
-    base.loc[mask, "nivel"] = (
-        base.loc[mask, "atingimento"]
-        .apply(classificar_nivel)
-    )
-
-    base["nivel_num"] = base["nivel"].map(MAPA_NIVEL_NUM)
-
-    return base
-
-
-# ======================
-# BASE PARA COMPARATIVOS (RESERVAS + HISTÓRICO)
-# ======================
-
-
-df_res_comp = df_res.copy()
-df_hist_comp = df_hist.copy()
-
-if partner_sel != "Todos":
-    df_res_comp = df_res_comp[df_res_comp["partner"] == partner_sel]
-    df_hist_comp = df_hist_comp[df_hist_comp["partnership"] == partner_sel]
-
-
 # ======================
 # PERÍODOS
 # ======================
@@ -463,9 +275,12 @@ periodo_yoy = periodo - 12
 # NÍVEL MÉDIO (ATUAL / M1 / YOY)
 # ======================
 
-base_niveis_atual = calcular_base_niveis(
-    df_hist_comp, df_meta, periodo, partner_sel
-)
+# base de níveis de todos os meses, uma por partner e versão dos dados;
+# atual, M-1, YoY e a evolução recente só fatiam
+with etapa("níveis (atual, M-1, YoY)"):
+    niveis_partner = base_niveis(partner_sel)
+
+base_niveis_atual = niveis_partner.mes(periodo)
 
 metricas_nivel_atual = {
     "atingimento_medio": (
@@ -478,9 +293,7 @@ metricas_nivel_atual = {
     )
 }
 
-base_niveis_m1 = calcular_base_niveis(
-    df_hist_comp, df_meta, periodo_m1, partner_sel
-)
+base_niveis_m1 = niveis_partner.mes(periodo_m1)
 
 metricas_nivel_m1 = {
     "atingimento_medio": (
@@ -493,9 +306,7 @@ metricas_nivel_m1 = {
     )
 }
 
-base_niveis_yoy = calcular_base_niveis(
-    df_hist_comp, df_meta, periodo_yoy, partner_sel
-)
+base_niveis_yoy = niveis_partner.mes(periodo_yoy)
 
 metricas_nivel_yoy = {
     "atingimento_medio": (
@@ -512,12 +323,14 @@ metricas_nivel_yoy = {
 # KPIs DE RESERVAS
 # ======================
 
-kpis_atual = calcular_kpis_mes(df_res_comp, periodo)
-kpis_m1 = calcular_kpis_mes(df_res_comp, periodo_m1)
-kpis_yoy = calcular_kpis_mes(df_res_comp, periodo_yoy)
+with etapa("KPIs de reservas"):
+    kpis_atual = calcular_kpis_mes(periodo)
+    kpis_m1 = calcular_kpis_mes(periodo_m1)
+    kpis_yoy = calcular_kpis_mes(periodo_yoy)
 
 if kpis_atual is None:
     st.warning("Sem dados para os filtros selecionados.")
+    painel_tempos({"figuras": cache_figuras()})
     st.stop()
 
 receita_total = kpis_atual["receita"]
@@ -529,9 +342,10 @@ tarifa_media = kpis_atual["tarifa_media"]
 # KPIs HISTÓRICOS (CLEANING / ADM)
 # ======================
 
-kpis_hist_atual = calcular_kpis_hist_mes(df_hist_comp, periodo)
-kpis_hist_m1 = calcular_kpis_hist_mes(df_hist_comp, periodo_m1)
-kpis_hist_yoy = calcular_kpis_hist_mes(df_hist_comp, periodo_yoy)
+with etapa("KPIs históricos"):
+    kpis_hist_atual = calcular_kpis_hist_mes(periodo)
+    kpis_hist_m1 = calcular_kpis_hist_mes(periodo_m1)
+    kpis_hist_yoy = calcular_kpis_hist_mes(periodo_yoy)
 
 cleaning_atual = kpis_hist_atual.get("cleaning") if kpis_hist_atual else None
 cleaning_m1 = kpis_hist_m1.get("cleaning") if kpis_hist_m1 else None
@@ -556,10 +370,6 @@ def variacao_pct(atual, anterior):
     return ((atual / anterior) - 1) * 100
 
 
-# ---- Base Histórico Unidades ----
-cleaning_revenue = df_hist_m["cleaning_revenue"].sum()
-taxa_adm = df_hist_m["adm_360"].sum()
-
 # ======================
 # KPIs — CARDS VISUAIS
 # ======================
@@ -666,9 +476,7 @@ with c6:
 with c7:
     card_kpi(
         "Unidades",
-        df_res_m[["propriedade", "unidade"]]
-        .drop_duplicates()
-        .shape[0],
+        df_res_m["id_unidade"].nunique(),
         "Unidades analisadas",
         "#020617"
     )
@@ -691,201 +499,226 @@ st.markdown("---")
 # SHARE DE CANAL
 # ======================
 
-st.subheader("📊 Share de Canal")
 
-canal_share = (
-    df_res_m
-    .groupby("canal", as_index=False)["valor_mes"]
-    .sum()
-)
+@st.fragment
+def secao_share_canal(df_res_m, filtros, versao):
+    st.subheader("📊 Share de Canal")
 
-total_receita = canal_share["valor_mes"].sum()
-
-if total_receita == 0:
-    st.info("Sem dados suficientes para calcular o share de canal.")
-else:
-    canal_share["share"] = canal_share["valor_mes"] / total_receita
-
-    fig_share = px.pie(
-        canal_share,
-        names="canal",
-        values="valor_mes",
-        hole=0.4,
-        title="Distribuição de Receita por Canal",
-        color="canal",
-        color_discrete_map=CORES_CANAIS
+    canal_share = (
+        df_res_m
+        .groupby("canal", as_index=False, observed=True)["valor_mes"]
+        .sum()
     )
 
-    fig_share.update_traces(
-        textinfo="label+percent",
-        hovertemplate=(
-            "Canal: %{label}<br>"
-            "Receita: R$ %{value:,.2f}<br>"
-            "Share: %{percent}"
+    total_receita = canal_share["valor_mes"].sum()
+
+    if total_receita == 0:
+        st.info("Sem dados suficientes para calcular o share de canal.")
+    else:
+        canal_share["share"] = canal_share["valor_mes"] / total_receita
+
+        def montar_share():
+            fig_share = px.pie(
+                canal_share,
+                names="canal",
+                values="valor_mes",
+                hole=0.4,
+                title="Distribuição de Receita por Canal",
+                color="canal",
+                color_discrete_map=CORES_CANAIS
+            )
+
+            fig_share.update_traces(
+                textinfo="label+percent",
+                hovertemplate=(
+                    "Canal: %{label}<br>"
+                    "Receita: R$ %{value:,.2f}<br>"
+                    "Share: %{percent}"
+                )
+            )
+            return fig_share
+
+        st.plotly_chart(
+            figura("fig_share", filtros, versao, montar_share),
+            use_container_width=True
         )
-    )
 
-    st.plotly_chart(fig_share, use_container_width=True)
+    # ======================
+    # TABELA — SHARE DE CANAL
+    # ======================
 
-# ======================
-# TABELA — SHARE DE CANAL
-# ======================
+    if total_receita > 0:
+        st.markdown("#### 📋 Receita por Canal")
 
-if total_receita > 0:
-    st.markdown("#### 📋 Receita por Canal")
+        tabela_share = canal_share.copy()
 
-    tabela_share = canal_share.copy()
+        tabela_share["Receita (R$)"] = tabela_share["valor_mes"]
+        tabela_share["Share (%)"] = tabela_share["share"] * 100
 
-    tabela_share["Receita (R$)"] = tabela_share["valor_mes"]
-    tabela_share["Share (%)"] = tabela_share["share"] * 100
+        tabela_share = (
+            tabela_share[["canal", "Receita (R$)", "Share (%)"]]
+            .sort_values("Receita (R$)", ascending=False)
+            .reset_index(drop=True)
+        )
 
-    tabela_share = (
-        tabela_share[["canal", "Receita (R$)", "Share (%)"]]
-        .sort_values("Receita (R$)", ascending=False)
-        .reset_index(drop=True)
-    )
+        with etapa("tabela receita por canal"):
+            st.dataframe(
+                tabela_share.style.format({
+                    "Receita (R$)": "R$ {:,.2f}",
+                    "Share (%)": "{:.1f}%"
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
 
-    st.dataframe(
-        tabela_share.style.format({
-            "Receita (R$)": "R$ {:,.2f}",
-            "Share (%)": "{:.1f}%"
-        }),
-        use_container_width=True,
-        hide_index=True
-    )
+
+with etapa("seção share de canal"):
+    secao_share_canal(df_res_m, filtros, versao_dados)
 
 # ======================
 # DISTRIBUIÇÃO DE NÍVEIS
 # ======================
 
-nivel_base = base_niveis_atual.copy()
 
-dist_niveis = (
-    nivel_base
-    .groupby("nivel", as_index=False)
-    .agg(
-        unidades=("unidade", "nunique"),
-        atingimento_medio=("atingimento", "mean")
+@st.fragment
+def secao_distribuicao_niveis(base_niveis_atual, filtros, versao):
+    dist_niveis = (
+        base_niveis_atual
+        .groupby("nivel", as_index=False)
+        .agg(
+            unidades=("id_unidade", "nunique"),
+            atingimento_medio=("atingimento", "mean")
+        )
     )
-)
 
-total_unidades = dist_niveis["unidades"].sum()
-
-if total_unidades > 0:
-    dist_niveis["share"] = dist_niveis["unidades"] / total_unidades
-else:
-    dist_niveis["share"] = 0
-
-ordem_niveis = [
-    "Nível 5",
-    "Nível 4",
-    "Nível 3",
-    "Nível 2",
-    "Nível 1",
-    "Sem Meta"
-]
-
-dist_niveis["nivel"] = pd.Categorical(
-    dist_niveis["nivel"],
-    categories=ordem_niveis,
-    ordered=True
-)
+    total_unidades = dist_niveis["unidades"].sum()
 
-dist_niveis = dist_niveis.sort_values("nivel")
+    if total_unidades > 0:
+        dist_niveis["share"] = dist_niveis["unidades"] / total_unidades
+    else:
+        dist_niveis["share"] = 0
+
+    ordem_niveis = [
+        "Nível 5",
+        "Nível 4",
+        "Nível 3",
+        "Nível 2",
+        "Nível 1",
+        "Sem Meta"
+    ]
+
+    dist_niveis["nivel"] = pd.Categorical(
+        dist_niveis["nivel"],
+        categories=ordem_niveis,
+        ordered=True
+    )
 
-# ======================
-# GRÁFICO COMBO DOS NÍVEIS
-# ======================
+    dist_niveis = dist_niveis.sort_values("nivel")
+
+    # ======================
+    # GRÁFICO COMBO DOS NÍVEIS
+    # ======================
+
+    st.divider()
+    st.subheader("🎯 Distribuição de Níveis — Quantidade e Share")
+    st.caption(f"Total de unidades analisadas: **{total_unidades}**")
+
+    def montar_niveis():
+        fig = go.Figure()
+
+        # ---- Barras: quantidade de unidades ----
+        fig.add_trace(
+            go.Bar(
+                x=dist_niveis["nivel"],
+                y=dist_niveis["unidades"],
+                name="Nº de Unidades",
+                marker_color=[CORES_NIVEIS[n] for n in dist_niveis["nivel"]],
+                text=dist_niveis["unidades"],
+                textposition="outside",
+                opacity=0.9
+            )
+        )
 
-st.divider()
-st.subheader("🎯 Distribuição de Níveis — Quantidade e Share")
-st.caption(f"Total de unidades analisadas: **{total_unidades}**")
-fig = go.Figure()
-
-# ---- Barras: quantidade de unidades ----
-fig.add_trace(
-    go.Bar(
-        x=dist_niveis["nivel"],
-        y=dist_niveis["unidades"],
-        name="Nº de Unidades",
-        marker_color=[CORES_NIVEIS[n] for n in dist_niveis["nivel"]],
-        text=dist_niveis["unidades"],
-        textposition="outside",
-        opacity=0.9
-    )
-)
+        # ---- Linha: share (%) ----
+        fig.add_trace(
+            go.Scatter(
+                x=dist_niveis["nivel"],
+                y=dist_niveis["share"] * 100,
+                name="Share (%)",
+                yaxis="y2",
+                mode="lines+markers",
+                line=dict(color=COR_SHARE, width=3),
+                marker=dict(size=8),
+                hovertemplate="Share: %{y:.1f}%"
+            )
+        )
 
-# ---- Linha: share (%) ----
-fig.add_trace(
-    go.Scatter(
-        x=dist_niveis["nivel"],
-        y=dist_niveis["share"] * 100,
-        name="Share (%)",
-        yaxis="y2",
-        mode="lines+markers",
-        line=dict(color=COR_SHARE, width=3),
-        marker=dict(size=8),
-        hovertemplate="Share: %{y:.1f}%"
-    )
-)
+        max_share = (
+            dist_niveis["share"].max() * 100
+            if not dist_niveis.empty else 100
+        )
 
-max_share = (
-    dist_niveis["share"].max() * 100
-    if not dist_niveis.empty else 100
-)
+        fig.update_layout(
+            yaxis=dict(
+                title="Nº de Unidades",
+                showgrid=True,
+                gridcolor="rgba(255,255,255,0.08)"
+            ),
+            yaxis2=dict(
+                title="Share (%)",
+                overlaying="y",
+                side="right",
+                range=[0, max_share * 1.2],
+                showgrid=False
+            ),
+            legend=dict(
+                orientation="h",
+                y=1.15,
+                x=0.01
+            ),
+            bargap=0.25,
+            margin=dict(t=80, b=40, l=40, r=40)
+        )
+        return fig
 
-fig.update_layout(
-    yaxis=dict(
-        title="Nº de Unidades",
-        showgrid=True,
-        gridcolor="rgba(255,255,255,0.08)"
-    ),
-    yaxis2=dict(
-        title="Share (%)",
-        overlaying="y",
-        side="right",
-        range=[0, max_share * 1.2],
-        showgrid=False
-    ),
-    legend=dict(
-        orientation="h",
-        y=1.15,
-        x=0.01
-    ),
-    bargap=0.25,
-    margin=dict(t=80, b=40, l=40, r=40)
-)
+    st.plotly_chart(
+        figura("fig_niveis", filtros, versao, montar_niveis),
+        use_container_width=True
+    )
 
-st.plotly_chart(fig, use_container_width=True)
+    # ======================
+    # TABELA — DISTRIBUIÇÃO DE NÍVEIS
+    # ======================
 
-# ======================
-# TABELA — DISTRIBUIÇÃO DE NÍVEIS
-# ======================
+    tabela_niveis = dist_niveis.copy()
 
-tabela_niveis = dist_niveis.copy()
+    tabela_niveis["Share (%)"] = tabela_niveis["share"] * 100
+    tabela_niveis["Atingimento Médio (%)"] = tabela_niveis["atingimento_medio"] * 100
 
-tabela_niveis["Share (%)"] = tabela_niveis["share"] * 100
-tabela_niveis["Atingimento Médio (%)"] = tabela_niveis["atingimento_medio"] * 100
+    tabela_niveis = tabela_niveis[
+        ["nivel", "unidades", "Share (%)", "Atingimento Médio (%)"]
+    ]
 
-tabela_niveis = tabela_niveis[
-    ["nivel", "unidades", "Share (%)", "Atingimento Médio (%)"]
-]
+    tabela_niveis = tabela_niveis.rename(
+        columns={
+            "nivel": "Nível",
+            "unidades": "Nº de Unidades"
+        }
+    )
 
-tabela_niveis = tabela_niveis.rename(
-    columns={
-        "nivel": "Nível",
-        "unidades": "Nº de Unidades"
-    }
-)
+    with etapa("tabela distribuição de níveis"):
+        st.dataframe(
+            tabela_niveis.style.format({
+                "Share (%)": "{:.1f}%",
+                "Atingimento Médio (%)": "{:.1f}%"
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
 
-st.dataframe(
-    tabela_niveis.style.format({
-        "Share (%)": "{:.1f}%",
-        "Atingimento Médio (%)": "{:.1f}%"
-    }),
-    use_container_width=True,
-    hide_index=True
-)
+
+with etapa("seção distribuição de níveis"):
+    secao_distribuicao_niveis(base_niveis_atual, filtros, versao_dados)
 
 # ======================
 # COMPARATIVOS TEMPORAIS
@@ -1013,196 +846,257 @@ if kpis_yoy:
 df_comp = pd.DataFrame(cards)
 
 # ======================
-# HISTÓRICO — ÚLTIMOS 3 MESES
+# EVOLUÇÃO RECENTE (JANELA SELECIONADA)
 # ======================
 
-st.divider()
-st.subheader("📊 Evolução Recente (Últimos 3 Meses)")
-st.caption("Valores absolutos por mês e variação em relação ao mês anterior")
 
-periodos_3m = [periodo - 2, periodo - 1, periodo]
-labels_3m = [p.strftime("%b/%y") for p in periodos_3m]
+def grafico_evolucao(
+    filtros, versao, titulo, valores, labels, nome_barra,
+    unidade="", cor="#2563eb"
+):
 
-# -------- Receita --------
-receita_3m = [
-    df_res_comp.loc[df_res_comp["mes_dt"] == p, "valor_mes"].sum()
-    for p in periodos_3m
-]
+    def montar():
+        delta = None
+        if len(valores) >= 2 and valores[-2] is not None:
+            delta = valores[-1] - valores[-2]
 
-# -------- Ocupação --------
-ocupacao_3m = []
-tarifa_3m = []
+        texto_delta = (
+            f"Δ último mês: {delta:+,.2f}{unidade}"
+            if isinstance(delta, (int, float))
+            else "Δ último mês: -"
+        )
 
-for p in periodos_3m:
-    k = calcular_kpis_mes(df_res_comp, p)
-    ocupacao_3m.append(k["ocupacao"] if k else 0)
-    tarifa_3m.append(k["tarifa_media"] if k else 0)
+        fig = go.Figure()
+        fig.add_bar(
+            x=labels,
+            y=valores,
+            marker_color=cor,
+            text=[
+                f"{v:,.2f}{unidade}" if isinstance(v, (int, float)) else "-"
+                for v in valores
+            ],
+            textposition="outside"
+        )
 
-# -------- Cleaning / Adm --------
-cleaning_3m = []
-adm_3m = []
+        fig.update_layout(
+            title=f"{titulo}<br><sup>{texto_delta}</sup>",
+            yaxis_title=nome_barra,
+            margin=dict(t=90, b=40)
+        )
+        return fig
 
-for p in periodos_3m:
-    k = calcular_kpis_hist_mes(df_hist_comp, p)
-    cleaning_3m.append(k["cleaning"] if k and k["cleaning"] else 0)
-    adm_3m.append(k["adm"] if k and k["adm"] else 0)
+    st.plotly_chart(
+        figura(("evolucao", titulo), filtros, versao, montar),
+        use_container_width=True
+    )
 
-# -------- Atingimento / Nível (USANDO A MESMA FUNÇÃO) --------
-ating_3m = []
-nivel_3m = []
 
-for p in periodos_3m:
-    base_tmp = calcular_base_niveis(df_hist_comp, df_meta, p, partner_sel)
+@st.fragment
+def secao_evolucao(partner, periodo, tabela_kpis, versao):
+    # a troca de janela reexecuta só esta seção
+    st.divider()
 
-    ating_3m.append(
-        base_tmp["atingimento"].mean() * 100
-        if not base_tmp.empty else 0
+    janela_sel = st.radio(
+        "📈 Janela",
+        JANELAS_EVOLUCAO,
+        format_func=lambda n: f"{n} meses",
+        horizontal=True
     )
 
-    nivel_3m.append(
-        base_tmp["nivel_num"].mean()
-        if not base_tmp.empty else 0
+    st.subheader(f"📊 Evolução Recente (Últimos {janela_sel} Meses)")
+    st.caption(
+        "Valores absolutos por mês e variação em relação ao mês anterior"
     )
 
+    periodo_yoy = periodo - 12
+    periodos_janela = list(
+        pd.period_range(periodo - (janela_sel - 1), periodo, freq="M")
+    )
+    labels_janela = [p.strftime("%b/%y") for p in periodos_janela]
+    filtros = (partner, periodo, janela_sel)
+
+    # -------- Receita / Ocupação / Tarifa / Cleaning / Adm --------
+    # linhas da tabela de KPIs (mês sem dados = 0)
+    kpis_janela = (
+        tabela_kpis
+        .reindex(periodos_janela)
+        [["receita", "ocupacao", "tarifa_media", "cleaning", "adm"]]
+        .fillna(0)
+    )
 
-def grafico_historico_3m(titulo, valores, labels, nome_barra, unidade="", cor="#2563eb"):
-
-    delta = None
-    if len(valores) >= 2 and valores[-2] is not None:
-        delta = valores[-1] - valores[-2]
+    # -------- Atingimento / Nível (agregados por mês) --------
+    niveis_janela = base_niveis(partner).medias(periodos_janela)
 
-    texto_delta = (
-        f"Δ último mês: {delta:+,.2f}{unidade}"
-        if isinstance(delta, (int, float))
-        else "Δ último mês: -"
-    )
+    # -------- Totais da janela / YTD (somas acumuladas) --------
+    acumulado = acumulado_mensal(partner)
 
-    fig = go.Figure()
-    fig.add_bar(
-        x=labels,
-        y=valores,
-        marker_color=cor,
-        text=[
-            f"{v:,.2f}{unidade}" if isinstance(v, (int, float)) else "-"
-            for v in valores
+    totais_janela = pd.DataFrame(
+        [
+            acumulado.janela(periodo, janela_sel),
+            acumulado.janela(periodo - janela_sel, janela_sel),
+            acumulado.ytd(periodo),
+            acumulado.ytd(periodo_yoy)
         ],
-        textposition="outside"
+        index=[
+            f"Últimos {janela_sel} meses",
+            f"{janela_sel} meses anteriores",
+            f"YTD {periodo.year}",
+            f"YTD {periodo_yoy.year} (até {periodo_yoy.strftime('%b')})"
+        ]
     )
 
-    fig.update_layout(
-        title=f"{titulo}<br><sup>{texto_delta}</sup>",
-        yaxis_title=nome_barra,
-        margin=dict(t=90, b=40)
-    )
-
-    st.plotly_chart(fig, use_container_width=True)
-
+    # -------- GRID --------
 
-# -------- GRID --------
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        grafico_evolucao(
+            filtros, versao,
+            titulo="Receita",
+            valores=kpis_janela["receita"].tolist(),
+            labels=labels_janela,
+            nome_barra="Receita (R$)"
+        )
 
+    with c2:
+        grafico_evolucao(
+            filtros, versao,
+            titulo="Ocupação",
+            valores=kpis_janela["ocupacao"].tolist(),
+            labels=labels_janela,
+            nome_barra="Ocupação (%)",
+            unidade="%",
+            cor="#f97316"
+        )
 
-c1, c2, c3 = st.columns(3)
-with c1:
-    grafico_historico_3m(
-        titulo="Receita",
-        valores=receita_3m,
-        labels=labels_3m,
-        nome_barra="Receita (R$)"
-    )
+    with c3:
+        grafico_evolucao(
+            filtros, versao,
+            titulo="Tarifa Média",
+            valores=kpis_janela["tarifa_media"].tolist(),
+            labels=labels_janela,
+            nome_barra="Tarifa Média (R$)"
+        )
 
-with c2:
-    grafico_historico_3m(
-        titulo="Ocupação",
-        valores=ocupacao_3m,
-        labels=labels_3m,
-        nome_barra="Ocupação (%)",
-        unidade="%",
-        cor="#f97316"
-    )
+    c4, c5 = st.columns(2)
+    with c4:
+        grafico_evolucao(
+            filtros, versao,
+            titulo="Cleaning Revenue",
+            valores=kpis_janela["cleaning"].tolist(),
+            labels=labels_janela,
+            nome_barra="Cleaning (R$)",
+            cor="#dc2626"
+        )
 
-with c3:
-    grafico_historico_3m(
-        titulo="Tarifa Média",
-        valores=tarifa_3m,
-        labels=labels_3m,
-        nome_barra="Tarifa Média (R$)"
-    )
+    with c5:
+        grafico_evolucao(
+            filtros, versao,
+            titulo="Taxa Adm",
+            valores=kpis_janela["adm"].tolist(),
+            labels=labels_janela,
+            nome_barra="Taxa Adm (R$)",
+            cor="#dc2626"
+        )
 
+    c6, c7 = st.columns(2)
+    with c6:
+        grafico_evolucao(
+            filtros, versao,
+            titulo="Atingimento Médio",
+            valores=(niveis_janela["atingimento"] * 100).tolist(),
+            labels=labels_janela,
+            nome_barra="Atingimento (%)",
+            unidade="%",
+            cor="#7c3aed"
+        )
 
-c4, c5 = st.columns(2)
-with c4:
-    grafico_historico_3m(
-        titulo="Cleaning Revenue",
-        valores=cleaning_3m,
-        labels=labels_3m,
-        nome_barra="Cleaning (R$)",
-        cor="#dc2626"
-    )
+    with c7:
+        grafico_evolucao(
+            filtros, versao,
+            titulo="Nível Médio",
+            valores=niveis_janela["nivel_num"].tolist(),
+            labels=labels_janela,
+            nome_barra="Nível Médio",
+            cor="#7c3aed"
+        )
 
-with c5:
-    grafico_historico_3m(
-        titulo="Taxa Adm",
-        valores=adm_3m,
-        labels=labels_3m,
-        nome_barra="Taxa Adm (R$)",
-        cor="#dc2626"
+    # -------- TOTAIS DA JANELA / YTD --------
+
+    st.markdown("#### 🧮 Totais da Janela e Acumulado no Ano")
+
+    tabela_totais = (
+        totais_janela[
+            ["receita", "ocupacao", "tarifa_media", "cleaning", "adm"]
+        ]
+        .rename(columns={
+            "receita": "Receita (R$)",
+            "ocupacao": "Ocupação (%)",
+            "tarifa_media": "Tarifa Média (R$)",
+            "cleaning": "Cleaning (R$)",
+            "adm": "Taxa Adm (R$)"
+        })
     )
 
+    with etapa("tabela totais da janela"):
+        st.dataframe(
+            tabela_totais.style.format({
+                "Receita (R$)": "R$ {:,.0f}",
+                "Ocupação (%)": "{:.1f}%",
+                "Tarifa Média (R$)": "R$ {:,.2f}",
+                "Cleaning (R$)": "R$ {:,.0f}",
+                "Taxa Adm (R$)": "R$ {:,.0f}"
+            }),
+            use_container_width=True
+        )
 
-c6, c7 = st.columns(2)
-with c6:
-    grafico_historico_3m(
-        titulo="Atingimento Médio",
-        valores=ating_3m,
-        labels=labels_3m,
-        nome_barra="Atingimento (%)",
-        unidade="%",
-        cor="#7c3aed"
-    )
 
-with c7:
-    grafico_historico_3m(
-        titulo="Nível Médio",
-        valores=nivel_3m,
-        labels=labels_3m,
-        nome_barra="Nível Médio",
-        cor="#7c3aed"
-    )
+with etapa("seção evolução recente"):
+    secao_evolucao(partner_sel, periodo, tabela_kpis, versao_dados)
 
 # ======================
 # TABELA FINAL (SOB DEMANDA)
 # ======================
 
-st.divider()
 
-with st.expander("📋 Ver tabela completa de comparativos temporais"):
-    if df_comp.empty:
-        st.info("Não há dados suficientes para comparativos temporais.")
-    else:
-        st.dataframe(
-            df_comp.style.format({
-                "Receita Atual": "R$ {:,.0f}",
-                "Receita M-1": "R$ {:,.0f}",
-                "Δ Receita": "{:+,.0f}",
+@st.fragment
+def secao_comparativos(df_comp):
+    st.divider()
 
-                "Ocupação Atual": "{:.1f}%",
-                "Ocupação M-1": "{:.1f}%",
+    with st.expander("📋 Ver tabela completa de comparativos temporais"):
+        if df_comp.empty:
+            st.info("Não há dados suficientes para comparativos temporais.")
+        else:
+            with etapa("tabela comparativos temporais"):
+                st.dataframe(
+                    df_comp.style.format({
+                        "Receita Atual": "R$ {:,.0f}",
+                        "Receita M-1": "R$ {:,.0f}",
+                        "Δ Receita": "{:+,.0f}",
 
-                "Tarifa Atual": "R$ {:,.2f}",
-                "Tarifa M-1": "R$ {:,.2f}",
+                        "Ocupação Atual": "{:.1f}%",
+                        "Ocupação M-1": "{:.1f}%",
 
-                "Cleaning Atual": "R$ {:,.0f}",
-                "Cleaning M-1": "R$ {:,.0f}",
+                        "Tarifa Atual": "R$ {:,.2f}",
+                        "Tarifa M-1": "R$ {:,.2f}",
 
-                "Adm Atual": "R$ {:,.0f}",
-                "Adm M-1": "R$ {:,.0f}",
+                        "Cleaning Atual": "R$ {:,.0f}",
+                        "Cleaning M-1": "R$ {:,.0f}",
 
-                "Atingimento Médio Atual (%)": "{:.1f}%",
-                "Atingimento Médio M-1 (%)": "{:.1f}%",
+                        "Adm Atual": "R$ {:,.0f}",
+                        "Adm M-1": "R$ {:,.0f}",
 
-                "Nível Médio Atual": "{:.2f}",
-                "Nível Médio M-1": "{:.2f}",
-            }),
-            use_container_width=True,
-            hide_index=True
-        )
+                        "Atingimento Médio Atual (%)": "{:.1f}%",
+                        "Atingimento Médio M-1 (%)": "{:.1f}%",
+
+                        "Nível Médio Atual": "{:.2f}",
+                        "Nível Médio M-1": "{:.2f}",
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+
+with etapa("seção comparativos"):
+    secao_comparativos(df_comp)
+
+painel_tempos({"figuras": cache_figuras()})
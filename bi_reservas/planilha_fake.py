@@ -0,0 +1,139 @@
+"""
+Planilha local no lugar do gspread, para exercitar BaseDados (dados.py)
+sem rede: mesmas chamadas (`worksheet`, `get_all_values`, `batch_get`)
+e um atraso artificial por aba para simular o I/O do Sheets.
+
+As células guardam o valor bruto, como no Sheets: números nas colunas
+de valor/quantidade (com alguns textos digitados no meio) e texto no
+resto. `get_all_values()` devolve tudo formatado ("R$ 1.234,50");
+`batch_get(..., value_render_option="UNFORMATTED_VALUE")` devolve os
+números como números e os textos como estão.
+"""
+import threading
+import time
+
+CABECALHOS = {
+    "Reservas": [
+        "id_reserva", "id_propriedade", "propriedade", "unidade", "canal",
+        "noites_mes", "valor_mes", "limpeza_mes", "mes", "partner"
+    ],
+    "Histórico Unidades": [
+        "Mês", "Partnership", "Propriedade", "Unidade", "cleaning_revenue",
+        "adm_360", "price_less_comission", "plclcadm"
+    ],
+    "Base Níveis": ["Propriedade", "Unidade", "Receita_Esperada"],
+}
+
+# colunas formatadas como moeda no Sheets
+MOEDA = {
+    "valor_mes", "limpeza_mes", "cleaning_revenue", "adm_360",
+    "price_less_comission", "plclcadm", "Receita_Esperada"
+}
+
+# textos digitados em colunas numéricas (ficam texto nos dois modos)
+TEXTOS_EM_NUMERICAS = ["R$ 1.234,56", "R$ -", "", "#N/A"]
+
+
+def _indice_coluna(letras):
+    # "A" -> 0, "Z" -> 25, "AA" -> 26
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + ord(letra) - ord("A") + 1
+    return indice - 1
+
+
+def _brl(valor):
+    texto = f"{valor:,.2f}".replace(",", "X").replace(".", ",")
+    return "R$ " + texto.replace("X", ".")
+
+
+def _formatar(valor, moeda):
+    # FORMATTED_VALUE: números saem com o formato da coluna
+    if isinstance(valor, str):
+        return valor
+    return _brl(valor) if moeda else str(valor)
+
+
+def grade_exemplo(aba, linhas=200):
+    """
+    Grade bruta (cabeçalho + linhas). A cada 17 linhas, uma célula de
+    valor vem como texto digitado (TEXTOS_EM_NUMERICAS).
+    """
+    grade = [list(CABECALHOS[aba])]
+    for i in range(linhas):
+        propriedade = f"Ed {i % 5}"
+        unidade = str(100 + i % 20)
+        mes = f"2024-{i % 12 + 1:02d}"
+        valor = i * 10 + 0.5
+        if i % 17 == 0:
+            valor = TEXTOS_EM_NUMERICAS[(i // 17) % len(TEXTOS_EM_NUMERICAS)]
+
+        if aba == "Reservas":
+            grade.append([
+                f"R{i}", f"P-{i % 5}", propriedade, unidade, "Airbnb",
+                3, valor, 100, mes, "P1"
+            ])
+        elif aba == "Histórico Unidades":
+            grade.append([
+                mes, "P1", propriedade, unidade, 100, 50.25, valor, valor
+            ])
+        else:
+            grade.append([propriedade, unidade, 3000])
+    return grade
+
+
+class AbaFake:
+    """Aba com `get_all_values()` e `batch_get()`, cada chamada com atraso."""
+
+    def __init__(self, grade, atraso=0.0):
+        self.grade = grade
+        self.atraso = atraso
+        self.leituras = 0
+        self._lock = threading.Lock()
+        self._moeda = [nome in MOEDA for nome in grade[0]]
+
+    def get_all_values(self):
+        with self._lock:
+            self.leituras += 1
+        time.sleep(self.atraso)
+        return [
+            [_formatar(v, m) for v, m in zip(linha, self._moeda)]
+            for linha in self.grade
+        ]
+
+    def batch_get(
+        self, faixas, major_dimension="ROWS",
+        value_render_option="FORMATTED_VALUE", **_
+    ):
+        # só o que dados.py usa: faixas de coluna inteira ("G:G")
+        time.sleep(self.atraso)
+        brutos = value_render_option == "UNFORMATTED_VALUE"
+        blocos = []
+        for faixa in faixas:
+            indice = _indice_coluna(faixa.split(":")[0])
+            moeda = self._moeda[indice]
+            coluna = [
+                v if brutos else _formatar(v, moeda)
+                for v in (linha[indice] for linha in self.grade)
+            ]
+            while coluna and coluna[-1] == "":
+                coluna.pop()
+            blocos.append([coluna])
+        return blocos
+
+
+class PlanilhaFake:
+    """
+    Spreadsheet com as três abas do BI. `atrasos`: aba -> segundos por
+    chamada (padrão 0).
+    """
+
+    def __init__(self, atrasos=None, linhas=200):
+        atrasos = atrasos or {}
+        self.abas = {
+            aba: AbaFake(grade_exemplo(aba, linhas), atrasos.get(aba, 0.0))
+            for aba in CABECALHOS
+        }
+
+    def worksheet(self, nome):
+        return self.abas[nome]
@@ -0,0 +1,48 @@
+import pandas as pd
+
+# ======================
+# TOP-N E PAGINAÇÃO NO SERVIDOR
+# ======================
+# Gráficos e tabelas por unidade mandam ao navegador só o que aparece:
+# as N maiores (+ "Outros") ou uma página. A seleção usa nlargest
+# (seleção parcial), sem ordenar a tabela inteira.
+
+TAMANHO_PAGINA = 50
+OPCOES_TOP_N = [10, 20, 50, None]  # None = todas
+
+
+def top_n_com_outros(df, rotulo, valor, n):
+    """
+    As `n` linhas de maior `valor` e uma linha "Outros (k)" com a soma
+    das demais. Com `n` None (ou tabela pequena), devolve `df` inteiro.
+    """
+    if n is None or len(df) <= n:
+        return df
+
+    topo = df.nlargest(n, valor)[[rotulo, valor]]
+    outros = pd.DataFrame({
+        rotulo: [f"Outros ({len(df) - n})"],
+        valor: [df[valor].sum() - topo[valor].sum()]
+    })
+    return pd.concat([topo, outros], ignore_index=True)
+
+
+def total_paginas(linhas, tamanho=TAMANHO_PAGINA):
+    return max(1, -(-linhas // tamanho))
+
+
+def pagina(df, numero, tamanho=TAMANHO_PAGINA):
+    """Página `numero` (a partir de 1) na ordem atual de `df`."""
+    inicio = (numero - 1) * tamanho
+    return df.iloc[inicio:inicio + tamanho]
+
+
+def pagina_ranking(df, valor, numero, tamanho=TAMANHO_PAGINA):
+    """
+    Página `numero` do ranking decrescente por `valor`, com a coluna
+    `rank`. Seleciona só as numero × tamanho primeiras linhas.
+    """
+    inicio = (numero - 1) * tamanho
+    linhas = df.nlargest(inicio + tamanho, valor).iloc[inicio:].copy()
+    linhas.insert(0, "rank", range(inicio + 1, inicio + 1 + len(linhas)))
+    return linhas